@@ -0,0 +1,119 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import logging
+import os
+import posixpath
+import shutil
+import tarfile
+import tempfile
+import zipfile
+from typing import Iterator, Optional
+
+log = logging.getLogger("scanservice")
+
+MEMORY_DIRECTORY = "/dev/shm"
+
+
+def is_archive(path) -> bool:
+    return os.path.isfile(path) and (tarfile.is_tarfile(path) or zipfile.is_zipfile(path))
+
+
+def member_path(name: str) -> Optional[str]:
+    """Return the normalized path of an archive member, or None if it would point outside the archive."""
+    path = posixpath.normpath(name.replace("\\", "/")).lstrip("/")
+    if path in ("", ".") or path == ".." or path.startswith("../"):
+        return None
+    return path
+
+
+class ArchiveMembers:
+    """The regular files of a tar or zip archive. Iterating the members reads the archive front to back and writes
+    each member to its own temporary file just before it is handed out, as scanners need a file to read. A member can
+    be released as soon as it is scanned, so only the members in flight take space, instead of the whole extracted
+    archive.
+
+    Listing the members reads the central directory of a zip archive and the headers of a tar archive. A compressed
+    tar archive has to be decompressed for that, so it is decompressed twice in total: once by `list` and once by
+    iterating the members.
+
+    Members up to `memory_limit` bytes are buffered in memory, in a directory of the tmpfs at /dev/shm, if there is
+    one. Larger members are written to `temp_dir`, by default SCANCODE_TEMP. All remaining files are removed on
+    `close`.
+    """
+
+    def __init__(self, path, memory_limit: int = 1024 * 1024, temp_dir: str = None):
+        self.path = str(path)
+        self.memory_limit = memory_limit
+        self.temp_dir = temp_dir or os.getenv("SCANCODE_TEMP") or tempfile.gettempdir()
+        self._roots = {}
+
+    @property
+    def name(self) -> str:
+        return os.path.basename(self.path)
+
+    def list(self) -> list[tuple[str, int]]:
+        """Return the path and size of all regular files in the archive. The member data of an uncompressed tar
+        archive is skipped by seeking.
+        """
+        if zipfile.is_zipfile(self.path):
+            with zipfile.ZipFile(self.path) as archive:
+                members = [(info.filename, info.file_size) for info in archive.infolist() if not info.is_dir()]
+        else:
+            with tarfile.open(self.path) as archive:
+                members = [(info.name, info.size) for info in archive if info.isfile()]
+        return [(path, size) for path, size in ((member_path(name), size) for name, size in members) if path]
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        """Yield the path of each regular file in the archive and the location of its temporary copy."""
+        if zipfile.is_zipfile(self.path):
+            with zipfile.ZipFile(self.path) as archive:
+                for info in archive.infolist():
+                    path = member_path(info.filename)
+                    if path and not info.is_dir():
+                        with archive.open(info) as member:
+                            yield path, self._extract(path, member, info.file_size, None)
+        else:
+            with tarfile.open(self.path, mode="r|*") as archive:
+                for info in archive:
+                    path = member_path(info.name)
+                    if path and info.isfile():
+                        yield path, self._extract(path, archive.extractfile(info), info.size, info.mtime)
+
+    def _extract(self, path: str, member, size: int, mtime: Optional[float]) -> str:
+        # Keep the name of the member, scanners may depend on it, e.g. to detect the programming language.
+        directory = tempfile.mkdtemp(dir=self._root(size <= self.memory_limit))
+        location = os.path.join(directory, posixpath.basename(path))
+        with open(location, "wb") as f:
+            shutil.copyfileobj(member, f)
+        if mtime is not None:
+            os.utime(location, (mtime, mtime))
+        return location
+
+    def _root(self, in_memory: bool) -> str:
+        in_memory = in_memory and os.path.isdir(MEMORY_DIRECTORY) and os.access(MEMORY_DIRECTORY, os.W_OK)
+        if in_memory not in self._roots:
+            self._roots[in_memory] = tempfile.mkdtemp(prefix="scancode-archive-",
+                                                      dir=MEMORY_DIRECTORY if in_memory else self.temp_dir)
+        return self._roots[in_memory]
+
+    @staticmethod
+    def release(location: str) -> None:
+        """Remove the temporary copy of a member."""
+        shutil.rmtree(os.path.dirname(location), ignore_errors=True)
+
+    def close(self) -> None:
+        for root in self._roots.values():
+            shutil.rmtree(root, ignore_errors=True)
+        self._roots.clear()
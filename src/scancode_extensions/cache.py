@@ -0,0 +1,156 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+import scancode_config
+from commoncode.filetype import get_last_modified_date
+from typecode.contenttype import Type
+
+from scancode_extensions.dedup import content_digest
+
+log = logging.getLogger("scanservice")
+
+# Keys of a scan result which depend on the scanned path and not on the file content. The file info scanner derives
+# the programming language, and with it whether a file is source or a script, from the file name.
+NAME_DEPENDENT_KEYS = ("programming_language", "is_source", "is_script")
+PATH_DEPENDENT_KEYS = ("date", *NAME_DEPENDENT_KEYS)
+
+EVICTION_RATIO = 0.9
+
+
+def fingerprint(scanners: Iterable[Callable], *options) -> str:
+    """Identify a set of scanners, their options and the used toolkit version. Results of scans with a different
+    fingerprint must never be mixed up.
+    """
+    names = [f"{getattr(s, '__module__', '')}.{getattr(s, '__qualname__', type(s).__qualname__)}" for s in scanners]
+    return "|".join([scancode_config.__version__, *names, *map(str, options)])
+
+
+class ResultCache:
+    """Disk backed cache for the merged scanner results of single files. Entries are addressed by the hash of the
+    file content together with a fingerprint of the scanners, so identical files found at different locations
+    share one entry. Once the cache grows beyond `max_size` bytes the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory: Path, max_size: int):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._size = sum(entry.stat().st_size for entry in self._entries())
+        log.info(f"Result cache in {self.directory} holds {self._size} of max. {self.max_size} bytes.")
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @staticmethod
+    def key(location: str, namespace: str, digest: str = None) -> Optional[str]:
+        """Return the key of the file at `location` from the SHA-256 `digest` of its content, which is computed if
+        not known yet. Return None if the file can not be read.
+        """
+        digest = digest or content_digest(location)
+        if digest is None:
+            return None
+        return hashlib.sha256(f"{namespace}\0{digest}".encode()).hexdigest()
+
+    def lookup(self, location: str, namespace: str, digest: str = None) -> tuple[Optional[str], Optional[dict]]:
+        """Return the cache key of the file at `location` and its cached result, if there is any."""
+        key = self.key(location, namespace, digest)
+        if key is None:
+            return None, None
+        result = self.get(key)
+        if result is not None:
+            refresh_path_dependent(result, location)
+        return key, result
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+            os.utime(path)
+            return result
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            log.warning(f"Dropping unreadable cache entry {path}: {e}")
+            self._remove(path)
+            return None
+
+    def put(self, key: str, result: dict) -> None:
+        path = self._path(key)
+        content = json.dumps({k: None if k in PATH_DEPENDENT_KEYS else v for k, v in result.items()})
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4()}.tmp")
+        try:
+            path.parent.mkdir(exist_ok=True)
+            tmp_path.write_text(content)
+            previous_size = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log.warning(f"Could not write cache entry {path}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return
+        with self._lock:
+            self._size += len(content.encode()) - previous_size
+            if self._size > self.max_size:
+                self._evict()
+
+    def _evict(self):
+        # Evict below the limit, otherwise every further write would list the whole cache directory again.
+        low_watermark = self.max_size * EVICTION_RATIO
+        entries = sorted(((e.stat().st_mtime, e) for e in self._entries()), key=lambda entry: entry[0])
+        for _, entry in entries:
+            if self._size <= low_watermark:
+                break
+            self._size -= self._remove(entry)
+        log.debug(f"Evicted result cache to {self._size} bytes.")
+
+    @staticmethod
+    def _remove(path: Path) -> int:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+            return size
+        except FileNotFoundError:
+            return 0
+
+    def _entries(self):
+        return self.directory.glob("*/*.json")
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+
+def refresh_path_dependent(result: dict, location: str, same_name: bool = False) -> None:
+    """Update the keys of `result` which depend on the path of the file at `location`. A result taken from a file
+    with the `same_name` keeps the keys derived from the name.
+    """
+    if "date" in result:
+        result["date"] = get_last_modified_date(location) or None
+    if same_name or not any(key in result for key in NAME_DEPENDENT_KEYS):
+        return
+    # Not typecode's get_type, it keeps the type of every file ever asked for.
+    file_type = Type(os.path.abspath(location))
+    result["programming_language"] = file_type.programming_language or None
+    result["is_source"] = bool(file_type.is_source)
+    result["is_script"] = bool(file_type.is_script)
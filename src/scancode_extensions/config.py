@@ -12,6 +12,9 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+from pathlib import Path
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -19,6 +22,23 @@ class ServiceSettings(BaseSettings):
     model_config = SettingsConfigDict(env_prefix="scancode_service_")
     processes: int = 6
     delta_t: int = 10
+    delta_t_per_mib: float = 0.0
+    max_in_flight: int = 64
+    queue_depth: int = 1024
+    batch_scans: int = 4
+    small_file_size: int = 16 * 1024
+    batch_files: int = 32
+    batch_bytes: int = 256 * 1024
+    archive_memory_limit: int = 1024 * 1024
+    deduplicate: bool = True
+    crash_retries: int = 1
+    recycle_tasks: int = 0
+    recycle_uss: int = 0
+    lightweight_classes: list[Literal["empty", "media", "archive", "binary"]] = ["empty", "media", "archive"]
+    result_cache: Optional[Path] = None
+    result_cache_size: int = 1024 ** 3
+    job_store: Optional[Path] = None
+    job_retention: int = 24 * 60 * 60
 
 
 settings = ServiceSettings()
@@ -0,0 +1,73 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import hashlib
+import logging
+from typing import Any, Optional
+
+log = logging.getLogger("scanservice")
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def content_digest(location: str) -> Optional[str]:
+    """Return the SHA-256 of the content of the file at `location`, or None if it can not be read."""
+    digest = hashlib.sha256()
+    try:
+        with open(location, "rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def content_digests(locations: list[str]) -> list[Optional[str]]:
+    return [content_digest(location) for location in locations]
+
+
+class Deduplicator:
+    """Track the content of the files of a single scan, so each content is scanned once. The first file with a
+    given content is the primary and is scanned. Every later file with the same content is a duplicate and gets a
+    copy of the result of the primary; duplicates found before that result is known wait for it.
+    """
+
+    def __init__(self):
+        self._primaries: dict[str, str] = {}
+        self._waiting: dict[str, list] = {}
+        self._results: dict[str, tuple[str, dict]] = {}
+
+    def add(self, path: str, digest: Optional[str], duplicate: Any = None) -> tuple[bool, Optional[tuple[str, dict]]]:
+        """Add the file at the relative `path` with content `digest`. Return whether it is to be scanned and the path
+        and result of its primary, if the result is known already. Otherwise, the `duplicate` is kept until `resolve`
+        is called for the primary.
+        """
+        if digest is None:
+            return True, None
+        if digest in self._results:
+            return False, self._results[digest]
+        if digest in self._waiting:
+            self._waiting[digest].append(duplicate)
+            return False, None
+        self._primaries[path] = digest
+        self._waiting[digest] = []
+        return True, None
+
+    def resolve(self, path: str, result: dict) -> list:
+        """Record the `result` of the file at `path` and return the duplicates waiting for it."""
+        digest = self._primaries.pop(path, None)
+        if digest is None:
+            return []
+        self._results[digest] = (path, result)
+        return self._waiting.pop(digest, [])
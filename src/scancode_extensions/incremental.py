@@ -0,0 +1,92 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import logging
+import os
+from typing import Iterable, Optional
+
+from commoncode.hash import sha1
+
+from scancode_extensions.cache import refresh_path_dependent
+from scancode_extensions.output import open_input
+
+log = logging.getLogger("scanservice")
+
+
+class PreviousResult:
+    """File entries of a previous scan report. A file which did not change since, judged by its size and SHA1, is
+    not scanned again; its entry is copied from the report instead. Only the `keys` produced by the scanners are
+    copied, everything else describes the location of the file and is taken from the new codebase.
+    """
+
+    def __init__(self, entries: dict[str, dict], keys: Iterable[str]):
+        self.entries = entries
+        self.keys = frozenset(keys)
+
+    @classmethod
+    def load(cls, path, scanners: str, keys: Iterable[str]) -> Optional["PreviousResult"]:
+        """Load the report at `path`. Return None if it can not be read or was scanned with other `scanners`, so
+        all files are scanned again.
+        """
+        try:
+            headers, files = read_report(path)
+        except (OSError, ValueError, KeyError) as e:
+            log.warning(f"Previous result {path} can not be read, scanning all files: {e}")
+            return None
+        options = (headers[0].get("options") or {}) if headers else {}
+        if options.get("scanners") != scanners:
+            log.warning(f"Previous result {path} was created with other scanners, scanning all files.")
+            return None
+        incomplete = {entry["path"] for header in headers
+                      for entry in (header.get("extra_data") or {}).get("deadline_exceeded", [])}
+        entries = {entry["path"]: entry for entry in files
+                   if entry.get("type") == "file" and not entry.get("scan_errors") and entry["path"] not in incomplete}
+        log.info(f"Loaded {len(entries)} file entries from previous result {path}.")
+        return cls(entries, keys)
+
+    def lookup(self, path: str, location: str) -> Optional[dict]:
+        """Return the previous result of the file at `location`, if the file did not change since."""
+        entry = self.entries.get(path)
+        if not entry or not entry.get("sha1"):
+            return None
+        try:
+            if os.path.getsize(location) != entry.get("size") or sha1(location) != entry["sha1"]:
+                return None
+        except OSError:
+            return None
+        result = {key: value for key, value in entry.items() if key in self.keys}
+        refresh_path_dependent(result, location, same_name=True)
+        return result
+
+    def lookup_all(self, files: list[tuple[str, str]]) -> list[Optional[dict]]:
+        return [self.lookup(path, location) for path, location in files]
+
+
+def read_report(path) -> tuple[list[dict], list[dict]]:
+    """Return the headers and file entries of a report in any of the output formats."""
+    with open_input(path) as f:
+        content = f.read()
+    try:
+        report = json.loads(content)
+        return report.get("headers", []), report["files"]
+    except ValueError:
+        pass
+    headers, files = [], []
+    for line in content.splitlines():
+        if line.strip():
+            part = json.loads(line)
+            headers.extend(part.get("headers", []))
+            files.extend(part.get("files", []))
+    return headers, files
@@ -0,0 +1,135 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from enum import Enum
+from typing import Optional
+
+log = logging.getLogger("scanservice")
+
+
+class JobState(str, Enum):
+    queued = "queued"
+    scanning = "scanning"
+    post_processing = "post-processing"
+    writing = "writing"
+    done = "done"
+    failed = "failed"
+    cancelled = "cancelled"
+
+    @property
+    def finished(self) -> bool:
+        return self in (JobState.done, JobState.failed, JobState.cancelled)
+
+
+class JobRegistry:
+    """Keep track of the state of all scans in a SQLite database. Each change of a state closes the current stage
+    of a scan and adds its duration to the stages of the scan. Finished scans are kept for `retention` seconds.
+
+    Without a `path` the database is kept in memory and does not survive a restart of the service. Scans which
+    were not finished when the service stopped are marked as failed on start.
+
+    Scans submitted together belong to the same batch and can be queried at once.
+    """
+
+    def __init__(self, path: Optional[str] = None, retention: int = 86400):
+        self.retention = retention
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(path) if path else ":memory:", check_same_thread=False)
+        with self._lock, self._connection as connection:
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    uuid TEXT PRIMARY KEY,
+                    scan_path TEXT NOT NULL,
+                    output_file TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    error TEXT,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL,
+                    stages TEXT NOT NULL,
+                    batch TEXT
+                )""")
+            columns = [row[1] for row in connection.execute("PRAGMA table_info(jobs)")]
+            if "batch" not in columns:
+                connection.execute("ALTER TABLE jobs ADD COLUMN batch TEXT")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_updated ON jobs (updated)")
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_batch ON jobs (batch)")
+            interrupted = connection.execute(
+                "UPDATE jobs SET state = ?, error = ? WHERE state NOT IN (?, ?, ?)",
+                (JobState.failed.value, "Service stopped during the scan.", JobState.done.value,
+                 JobState.failed.value, JobState.cancelled.value)).rowcount
+        if interrupted:
+            log.warning(f"Marked {interrupted} scans as failed, which were interrupted by a restart.")
+
+    def create(self, uuid, scan_path, output_file) -> None:
+        self.create_batch(None, [(uuid, scan_path, output_file)])
+
+    def create_batch(self, batch, scans: list[tuple]) -> None:
+        """Register the `scans`, each given by its uuid, scan path and output file, in a single transaction."""
+        self.purge()
+        now = time.time()
+        with self._lock, self._connection as connection:
+            connection.executemany(
+                "INSERT INTO jobs (uuid, scan_path, output_file, state, created, updated, stages, batch) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(str(uuid), str(scan_path), str(output_file), JobState.queued.value, now, now, "{}",
+                  str(batch) if batch else None) for uuid, scan_path, output_file in scans])
+
+    def update(self, uuid, state: JobState, error: str = None) -> None:
+        now = time.time()
+        with self._lock, self._connection as connection:
+            row = connection.execute("SELECT state, updated, stages FROM jobs WHERE uuid = ?",
+                                     (str(uuid),)).fetchone()
+            if not row:
+                log.warning(f"Scan {uuid} is not registered. State {state.value} is dropped.")
+                return
+            previous_state, updated, stages = row
+            stages = json.loads(stages)
+            stages[previous_state] = stages.get(previous_state, 0.0) + now - updated
+            connection.execute("UPDATE jobs SET state = ?, error = ?, updated = ?, stages = ? WHERE uuid = ?",
+                               (state.value, error, now, json.dumps(stages), str(uuid)))
+
+    def get(self, uuid) -> Optional[dict]:
+        with self._lock:
+            row = self._connection.execute(f"SELECT {COLUMNS} FROM jobs WHERE uuid = ?", (str(uuid),)).fetchone()
+        return _job(row) if row else None
+
+    def get_batch(self, batch) -> list[dict]:
+        """Return all scans of `batch` in the order they were submitted."""
+        with self._lock:
+            rows = self._connection.execute(f"SELECT {COLUMNS} FROM jobs WHERE batch = ? ORDER BY rowid",
+                                            (str(batch),)).fetchall()
+        return [_job(row) for row in rows]
+
+    def purge(self) -> None:
+        """Remove all finished scans which are older than the retention period."""
+        with self._lock, self._connection as connection:
+            removed = connection.execute("DELETE FROM jobs WHERE state IN (?, ?, ?) AND updated < ?",
+                                         (JobState.done.value, JobState.failed.value, JobState.cancelled.value,
+                                          time.time() - self.retention)).rowcount
+        if removed:
+            log.debug(f"Removed {removed} finished scans from the registry.")
+
+
+COLUMNS = "uuid, scan_path, output_file, state, error, created, updated, stages, batch"
+
+
+def _job(row: tuple) -> dict:
+    uuid, scan_path, output_file, state, error, created, updated, stages, batch = row
+    return dict(uuid=uuid, status=state, scan_path=scan_path, output_file=output_file, error=error,
+                created=created, updated=updated, stages=json.loads(stages), batch=batch)
@@ -0,0 +1,193 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import bisect
+import math
+import threading
+from collections import defaultdict
+from typing import Callable, Union
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+registry = []
+
+
+class Metric:
+    """A metric in the Prometheus text exposition format. Values are kept per combination of label values."""
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labels):
+            raise ValueError(f"Metric {self.name} expects the labels {self.labels}, got {tuple(labels)}.")
+        return tuple(str(labels[label]) for label in self.labels)
+
+    @property
+    def family(self) -> str:
+        """The name of the metric family in HELP and TYPE, which has to match the names of its samples."""
+        return self.name
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.family} {self.documentation}", f"# TYPE {self.family} {self.kind}"]
+        with self._lock:
+            for name, labels, value in self._samples():
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = defaultdict(float)
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] += amount
+
+    @property
+    def family(self) -> str:
+        return f"{self.name}_total"
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        for key, value in self._values.items():
+            yield self.family, dict(zip(self.labels, key)), value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values = defaultdict(float)
+        self._function = None
+        if not self.labels:
+            self._values[()] = 0.0
+
+    def set_function(self, function: Callable[[], Union[float, dict[tuple, float]]]) -> None:
+        """Read the value from `function` whenever the gauge is rendered. A gauge with labels reads a dict from the
+        label values to the value.
+        """
+        self._function = function
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] += amount
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        if self._function and self.labels:
+            for key, value in self._function().items():
+                yield self.name, dict(zip(self.labels, key)), value
+            return
+        if self._function:
+            yield self.name, {}, self._function()
+            return
+        for key, value in self._values.items():
+            yield self.name, dict(zip(self.labels, key)), value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = {}
+        self._sums = defaultdict(float)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * (len(self.buckets) + 1))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[key] += value
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def _samples(self):
+        for key, counts in self._counts.items():
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                yield f"{self.name}_bucket", dict(labels, le=bound), cumulative
+            yield f"{self.name}_count", labels, cumulative
+            yield f"{self.name}_sum", labels, self._sums[key]
+
+
+def render() -> str:
+    """Return all registered metrics in the Prometheus text exposition format."""
+    return "\n".join(metric.render() for metric in registry) + "\n"
+
+
+def _format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(_format_value(value))}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value) -> str:
+    if isinstance(value, str):
+        return value
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+scanner_seconds = Histogram("scanservice_scanner_seconds", "Execution time of a scanner for a single file.",
+                            labels=("scanner",))
+deadline_hits = Counter("scanservice_deadline_hits", "Files for which a scanner exceeded its deadline.",
+                        labels=("scanner",))
+pool_queue_depth = Gauge("scanservice_pool_queue_depth", "Files waiting for a free worker of the process pool.")
+pool_busy_workers = Gauge("scanservice_pool_busy_workers", "Workers of the process pool scanning a file.")
+merge_seconds = Histogram("scanservice_merge_seconds",
+                          "Time from queueing a scan result until it is merged into the codebase.")
+json_write_seconds = Histogram("scanservice_json_write_seconds", "Time to finish writing the output file of a scan.")
+scans_in_flight = Gauge("scanservice_scans_in_flight", "Scans currently running.")
+pool_restarts = Counter("scanservice_pool_restarts", "Restarts of the process pool after a worker died.")
+files_quarantined = Counter("scanservice_files_quarantined", "Files quarantined after they crashed a worker.")
+pool_recycles = Counter("scanservice_pool_recycles", "Replacements of the worker processes due for recycling.",
+                        labels=("reason",))
+worker_uss_bytes = Gauge("scanservice_worker_uss_bytes", "Unique set size, the private memory, of a worker process.", labels=("pid",))
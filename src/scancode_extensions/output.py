@@ -0,0 +1,188 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import functools
+import gzip
+import importlib.util
+import json
+import logging
+import os
+from enum import Enum
+from typing import TextIO
+
+import jsonstreams
+from commoncode.resource import Resource
+from licensedcode.detection import populate_matches_with_path
+
+from scancode_extensions.resource import ScancodeCodebase as Codebase
+from scancode_extensions.utils import temporary_path
+
+log = logging.getLogger("scanservice")
+
+GZIP_MAGIC = b"\x1f\x8b"
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+@functools.cache
+def referencing_rules() -> frozenset:
+    """Identifiers of all license rules which reference other files, like 'see LICENSE'."""
+    from licensedcode.cache import get_index
+    return frozenset(rule.identifier for rule in get_index().rules_by_rid if rule.referenced_filenames)
+
+
+def may_change_in_post_processing(resource: Resource) -> bool:
+    """Return True if the license post-processing may add the license matches of other files to `resource`."""
+    rules = referencing_rules()
+    return any(match["rule_identifier"] in rules
+               for detection in resource.license_detections or []
+               for match in detection["matches"])
+
+
+class OutputFormat(str, Enum):
+    json_pp = "json-pp"
+    json = "json"
+    json_lines = "jsonl"
+
+
+class Compression(str, Enum):
+    none = "none"
+    gzip = "gzip"
+    zstd = "zstd"
+
+
+def is_available(compression: Compression) -> bool:
+    if compression == Compression.zstd:
+        return importlib.util.find_spec("zstandard") is not None
+    return True
+
+
+def open_output(path: str, compression: Compression) -> TextIO:
+    if compression == Compression.gzip:
+        return gzip.open(path, "wt", encoding="utf-8")
+    if compression == Compression.zstd:
+        import zstandard
+        return zstandard.open(path, "wt", encoding="utf-8")
+    return open(path, "w", encoding="utf-8")
+
+
+def open_input(path: str) -> TextIO:
+    """Open a report written by one of the writers, whatever its compression."""
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic.startswith(GZIP_MAGIC):
+        return gzip.open(path, "rt", encoding="utf-8")
+    if magic == ZSTD_MAGIC:
+        import zstandard
+        return zstandard.open(path, "rt", encoding="utf-8")
+    return open(path, encoding="utf-8")
+
+
+def create_writer(output_file, output_format: OutputFormat = OutputFormat.json_pp,
+                  compression: Compression = Compression.none) -> "StreamingJsonWriter":
+    if output_format == OutputFormat.json_lines:
+        return StreamingJsonLinesWriter(output_file, compression=compression)
+    return StreamingJsonWriter(output_file, pretty=output_format == OutputFormat.json_pp, compression=compression)
+
+
+class StreamingJsonWriter:
+    """Write the scan report of a codebase while the scan is running, in the same format as JsonPrettyOutput or,
+    if not `pretty`, as JsonCompactOutput.
+
+    Each file resource is written by `add` as soon as its results are merged, so the serialized report is never
+    held in memory. Resources which may still change in the license post-processing and all directories, whose
+    counts are only known at the end, are written by `close` together with the headers. So the 'files' come first
+    in the report. The report is written to a temporary file, which is renamed to `output_file` by `close`.
+    Each resource must be added only once.
+    """
+
+    def __init__(self, output_file, pretty: bool = True, compression: Compression = Compression.none):
+        self.output_file = str(output_file)
+        self.tmp_file = temporary_path(self.output_file)
+        self.fd = open_output(self.tmp_file, compression)
+        self.deferred = set()
+        self.written = 0
+        self._open(pretty)
+
+    def _open(self, pretty: bool) -> None:
+        self.stream = jsonstreams.Stream(jsonstreams.Type.OBJECT, fd=self.fd, close_fd=True,
+                                         indent=2 if pretty else None, pretty=pretty)
+        self.files = self.stream.subarray("files")
+
+    def add(self, resource: Resource) -> None:
+        if not resource.is_file:
+            return
+        if may_change_in_post_processing(resource):
+            self.deferred.add(resource.path)
+            return
+        self._write(resource, populate_from_file=True)
+
+    def _write(self, resource: Resource, populate_from_file: bool = False) -> None:
+        entry = resource.to_dict(with_info=True)
+        if populate_from_file:
+            # The post-processing does the same to the codebase, but this entry is already written by then.
+            for detection in entry.get("license_detections") or []:
+                populate_matches_with_path(matches=detection["matches"], path=resource.path)
+            populate_matches_with_path(matches=entry.get("license_clues") or [], path=resource.path)
+        self._write_entry(entry)
+        self.written += 1
+
+    def _write_entry(self, entry: dict) -> None:
+        self.files.write(entry)
+
+    def close(self, codebase: Codebase) -> None:
+        """Write all remaining resources and the headers of `codebase` and move the report to its destination."""
+        for resource in codebase.walk_filtered(topdown=True):
+            if not resource.is_file or resource.path in self.deferred:
+                self._write(resource)
+        codebase.add_files_count_to_current_header()
+        self._close(codebase)
+        os.rename(self.tmp_file, self.output_file)
+        log.debug(f"Wrote {self.written} resources into {self.output_file}, {len(self.deferred)} of them deferred.")
+
+    def _close(self, codebase: Codebase) -> None:
+        self.files.close()
+        self.stream.write("headers", codebase.get_headers())
+        if codebase.attributes:
+            for attribute_key, attribute_value in codebase.attributes.to_dict().items():
+                self.stream.write(attribute_key, attribute_value)
+        self.stream.close()
+
+    def abort(self) -> None:
+        """Discard the partially written report."""
+        self.fd.close()
+        if os.path.exists(self.tmp_file):
+            os.remove(self.tmp_file)
+
+
+class StreamingJsonLinesWriter(StreamingJsonWriter):
+    """Write the scan report as JSON Lines like JsonLinesOutput does, one resource per line. As the report is
+    streamed, the lines with the headers and the codebase attributes come last.
+    """
+
+    def _open(self, pretty: bool) -> None:
+        pass
+
+    def _write_entry(self, entry: dict) -> None:
+        self._write_line({"files": [entry]})
+
+    def _write_line(self, value: dict) -> None:
+        self.fd.write(json.dumps(value, separators=(",", ":")))
+        self.fd.write("\n")
+
+    def _close(self, codebase: Codebase) -> None:
+        self._write_line({"headers": codebase.get_headers()})
+        for name, value in codebase.attributes.to_dict().items():
+            if value:
+                self._write_line({name: value})
+        self.fd.close()
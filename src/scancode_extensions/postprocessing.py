@@ -0,0 +1,76 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from concurrent.futures import Executor
+from itertools import chain
+
+from licensedcode import cache
+from licensedcode.detection import UniqueDetection
+from licensedcode.detection import collect_license_detections
+from licensedcode.detection import sort_unique_detections
+from licensedcode.plugin_license import add_referenced_filenames_license_matches_for_detections
+
+from scancode_extensions.resource import ScancodeCodebase as Codebase
+from scancode_extensions.utils import timings
+from scancode_extensions.worker import find_license_references
+
+CHUNK_SIZE = 512
+
+
+@timings
+def add_license_detections(codebase: Codebase, executor: Executor = None, chunk_size: int = CHUNK_SIZE,
+                           license_text=False, license_diagnostics=False, license_text_diagnostics=False):
+    """Post-process `codebase` like LicenseScanner.process_codebase does: follow references to license matches in
+    other files and add the top-level unique license detections.
+
+    Most resources do not reference other files. Finding the ones that do works per resource, so it is split into
+    chunks of `chunk_size` resources for `executor`. Only the referencing resources are processed with the codebase.
+    """
+    cche = cache.get_cache()
+
+    cle = codebase.get_or_create_current_header()
+
+    if cche.additional_license_directory:
+        cle.extra_data['additional_license_directory'] = cche.additional_license_directory
+
+    if cche.additional_license_plugins:
+        cle.extra_data['additional_license_plugins'] = cche.additional_license_plugins
+
+    if codebase.has_single_resource and not codebase.root.is_file:
+        return
+
+    candidates = [(r.path, r.license_detections) for r in codebase.walk() if r.is_file and r.license_detections]
+    chunks = [candidates[i:i + chunk_size] for i in range(0, len(candidates), chunk_size)]
+    mapper = executor.map if executor else map
+    referencing = set(chain.from_iterable(mapper(find_license_references, chunks)))
+
+    for resource in codebase.walk(topdown=False):
+        if resource.path not in referencing:
+            continue
+        try:
+            add_referenced_filenames_license_matches_for_detections(resource, codebase)
+        except Exception as e:
+            raise Exception(f"Failed to process resource: {resource!r}") from e
+
+    license_detections = collect_license_detections(codebase=codebase, include_license_clues=False)
+    unique_license_detections = UniqueDetection.get_unique_detections(license_detections=license_detections)
+    unsorted_license_detections = [
+        unique_detection.to_dict(
+            include_text=license_text,
+            license_diagnostics=license_diagnostics,
+            license_text_diagnostics=license_text_diagnostics,
+        )
+        for unique_detection in unique_license_detections
+    ]
+    codebase.attributes.license_detections.extend(sort_unique_detections(unsorted_license_detections))
@@ -0,0 +1,82 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import dataclasses
+import time
+from dataclasses import field
+from typing import Optional
+
+
+@dataclasses.dataclass
+class ScanProgress:
+    """Counters of a running scan. The files are counted when the codebase is created, the scanned files and bytes
+    by `AsynchronousScan.scan_file` and the merged results by the `MergeThread`. Each counter is written by a
+    single thread only, so no lock is needed.
+
+    Files excluded by the filters of the scan request are counted as filtered and are not scanned.
+
+    Files for which a scanner exceeded its deadline are kept with the names of these scanners, as their results
+    may be incomplete. Files which crashed a worker repeatedly are quarantined.
+    """
+    files_discovered: int = 0
+    files_scanned: int = 0
+    files_from_cache: int = 0
+    files_unchanged: int = 0
+    files_filtered: int = 0
+    files_duplicate: int = 0
+    files_merged: int = 0
+    bytes_scanned: int = 0
+    deadline_exceeded: dict[str, list[str]] = field(default_factory=dict)
+    quarantined: list[str] = field(default_factory=list)
+    started: float = field(default_factory=time.perf_counter)
+
+    def scanned(self, result: dict, cached: bool = False, unchanged: bool = False, duplicate: bool = False) -> None:
+        self.files_scanned += 1
+        self.bytes_scanned += result.get("size") or 0
+        if cached:
+            self.files_from_cache += 1
+        if unchanged:
+            self.files_unchanged += 1
+        if duplicate:
+            self.files_duplicate += 1
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files_scanned / max(self.elapsed, 1e-9)
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_scanned / max(self.elapsed, 1e-9)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """Estimated seconds until all discovered files are scanned, based on the rate so far."""
+        if not self.files_scanned:
+            return None
+        remaining = self.files_discovered - self.files_filtered - self.files_scanned
+        return max(remaining, 0) / self.files_per_second
+
+    def to_dict(self) -> dict:
+        return dict(files_discovered=self.files_discovered, files_scanned=self.files_scanned,
+                    files_from_cache=self.files_from_cache, files_unchanged=self.files_unchanged,
+                    files_filtered=self.files_filtered, files_duplicate=self.files_duplicate,
+                    files_merged=self.files_merged,
+                    bytes_scanned=self.bytes_scanned, deadline_exceeded=len(self.deadline_exceeded),
+                    quarantined=len(self.quarantined),
+                    files_per_second=self.files_per_second,
+                    bytes_per_second=self.bytes_per_second, elapsed=self.elapsed, eta=self.eta)
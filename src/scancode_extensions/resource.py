@@ -13,21 +13,19 @@
 #  limitations under the License.
 
 import functools
+import os
+
 import scancode_config
 
 from cluecode.plugin_copyright import CopyrightScanner
-from commoncode.resource import Codebase
+from commoncode.resource import Codebase, VirtualCodebase
 from licensedcode.plugin_license import LicenseScanner
 from scancode.plugin_info import InfoScanner
 
 from scancode_extensions.utils import timings, get_system_environment
 
 
-class ScancodeCodebase(Codebase):
-    def __init__(self, *args, with_info=True, **kwargs, ):
-        self.with_info = with_info
-        super().__init__(*args, **kwargs, )
-
+class ScancodeCodebaseMixin:
     def save_initial_counts(self):
         files_count, dirs_count, size_count = self.compute_counts()
         self.save_counts('initial', dirs_count, files_count, size_count)
@@ -56,6 +54,12 @@ class ScancodeCodebase(Codebase):
         self.save_final_counts(skip_root=False)
         self.add_files_count_to_current_header()
 
+
+class ScancodeCodebase(ScancodeCodebaseMixin, Codebase):
+    def __init__(self, *args, with_info=True, **kwargs, ):
+        self.with_info = with_info
+        super().__init__(*args, **kwargs, )
+
     @functools.cache
     def _load_resource(self, path):
         return super()._load_resource(path)
@@ -78,9 +82,37 @@ def codebase_attributes():
     return attributes
 
 
+class ScancodeArchiveCodebase(ScancodeCodebaseMixin, VirtualCodebase):
+    """A codebase of the files in an archive, which exist only as paths within the archive."""
+
+
+@timings
+def create_archive_codebase(name: str, members: list[tuple[str, int]]) -> ScancodeArchiveCodebase:
+    """Create a codebase with a root named `name` containing the files at the archive relative paths of `members`.
+    Like the paths of a codebase of a directory, all paths start with the name of the root.
+    """
+    files = [dict(path=name, type="directory")]
+    files.extend(dict(path=f"{name}/{path}", type="file", size=size) for path, size in members)
+    codebase = ScancodeArchiveCodebase(dict(files=files), codebase_attributes=codebase_attributes(),
+                                       resource_attributes=resource_attributes())
+    codebase.save_initial_counts()
+    return codebase
+
+
 @timings
-def create_codebase(base):
+def create_codebase(base, with_sizes: bool = False):
+    """Create the codebase of the files at `base`. The size of each file is only known `with_sizes`, otherwise it is
+    added by the scanners.
+    """
     codebase = ScancodeCodebase(location=base, codebase_attributes=codebase_attributes(),
                                 resource_attributes=resource_attributes())
+    if with_sizes:
+        for resource in codebase.walk():
+            if resource.is_file:
+                try:
+                    resource.size = os.path.getsize(resource.location)
+                except OSError:
+                    continue
+                codebase.save_resource(resource)
     codebase.save_initial_counts()
     return codebase
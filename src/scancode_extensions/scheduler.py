@@ -0,0 +1,109 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Hashable
+
+log = logging.getLogger("scanservice")
+
+
+class FairScheduler:
+    """Admit work of several scans to the process pool. At most `slots` jobs run at the same time; all others wait
+    in a queue per scan. A free slot goes to the waiting scan with the lowest virtual time. Each admitted job advances
+    the virtual time of its scan by 1 / `weight`, so scans share the pool in proportion to their weights (weighted
+    fair queuing) and scans with the same weight take turns.
+
+    A scan which starts waiting continues at the current virtual time, so a small scan submitted while a large scan
+    is running gets its share right away instead of waiting until the large scan is drained.
+    """
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.running = 0
+        self.virtual_time = 0.0
+        self._queues: dict[Hashable, deque] = {}
+        self._passes: dict[Hashable, float] = {}
+        self._weights: dict[Hashable, float] = {}
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @asynccontextmanager
+    async def slot(self, key: Hashable, weight: float = 1):
+        await self.acquire(key, weight)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, key: Hashable, weight: float = 1) -> None:
+        if self.running < self.slots and not self._queues:
+            self._admit(key, weight)
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(key, weight, future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()
+            else:
+                self._discard(key, future)
+            raise
+
+    def release(self) -> None:
+        self.running -= 1
+        self._dispatch()
+
+    def forget(self, key: Hashable) -> None:
+        """Drop the virtual time of a finished scan."""
+        if key not in self._queues:
+            self._passes.pop(key, None)
+            self._weights.pop(key, None)
+
+    def _enqueue(self, key, weight, future):
+        if key not in self._queues:
+            self._queues[key] = deque()
+            self._passes[key] = max(self._passes.get(key, 0.0), self.virtual_time)
+        self._weights[key] = weight
+        self._queues[key].append(future)
+
+    def _discard(self, key, future):
+        queue = self._queues.get(key)
+        if queue and future in queue:
+            queue.remove(future)
+            if not queue:
+                del self._queues[key]
+
+    def _admit(self, key, weight):
+        start = max(self._passes.get(key, 0.0), self.virtual_time)
+        self.virtual_time = start
+        self._passes[key] = start + 1 / weight
+        self.running += 1
+
+    def _dispatch(self):
+        while self.running < self.slots and self._queues:
+            key = min(self._queues, key=lambda k: self._passes[k])
+            queue = self._queues[key]
+            future = queue.popleft()
+            if not queue:
+                del self._queues[key]
+            if future.done():
+                continue
+            self._admit(key, self._weights[key])
+            future.set_result(None)
@@ -13,63 +13,197 @@
 #  limitations under the License.
 
 import asyncio
+import copy
 import dataclasses
+import gc
 import logging
-import operator
+import multiprocessing
 import os
+import posixpath
+import queue
 import time
 import uuid
+from collections import defaultdict
+from concurrent.futures import Executor
 from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from dataclasses import field
-from functools import reduce, partial
+from enum import Enum
+from fnmatch import fnmatchcase
+from functools import partial
 from pathlib import Path
 from threading import Thread
-from typing import Any, Callable
+from typing import Any, Callable, Collection, Iterable, Optional
 
-from commoncode.resource import skip_ignored
+from commoncode.resource import Resource
 from commoncode.timeutils import time2tstamp
-from fastapi import FastAPI, HTTPException
-from formattedcode.output_json import JsonPrettyOutput
-from licensedcode.plugin_license import LicenseScanner
-from pydantic import BaseModel
+from fastapi import Body, FastAPI, Header, HTTPException, Query
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 from scancode.api import get_licenses, get_file_info
 from starlette.concurrency import run_in_threadpool
 
+from scancode_extensions import metrics
+from scancode_extensions import output
+from scancode_extensions import postprocessing
 from scancode_extensions import resource
 from scancode_extensions.allrights_plugin import allrights_scanner
+from scancode_extensions.archive import ArchiveMembers, is_archive
+from scancode_extensions.cache import ResultCache, fingerprint, refresh_path_dependent
 from scancode_extensions.config import settings
+from scancode_extensions.dedup import Deduplicator, content_digests
+from scancode_extensions.incremental import PreviousResult
+from scancode_extensions.jobs import JobRegistry, JobState
+from scancode_extensions.output import Compression, OutputFormat, StreamingJsonWriter, create_writer
+from scancode_extensions.progress import ScanProgress
 from scancode_extensions.resource import ScancodeCodebase as Codebase
-from scancode_extensions.utils import compute_scanroot_relative, timings, make_atomic
+from scancode_extensions.scheduler import FairScheduler
+from scancode_extensions.stream import MEDIA_TYPES, ResultLog, StreamFormat, render
+from scancode_extensions.utils import timings
+from scancode_extensions.worker import initialize_worker, timed_scan_resources, worker_ready
 
 log = logging.getLogger("scanservice")
 
 scancode_config = dict(output_dir="/tmp")
 
 
+class Scanner(str, Enum):
+    info = "info"
+    licenses = "licenses"
+    copyrights = "copyrights"
+
+
+SCANNERS = {Scanner.info: get_file_info, Scanner.licenses: get_licenses, Scanner.copyrights: allrights_scanner}
+
+
+def matches(path: str, patterns: Iterable[str]) -> bool:
+    """Return True if any of the glob `patterns` matches the relative `path`, one of its parent directories or one
+    of its path segments. So `*.js` matches all JavaScript files and `node_modules` all files below such a directory.
+    """
+    parts = path.split("/")
+    candidates = ["/".join(parts[:i]) for i in range(1, len(parts) + 1)] + parts
+    return any(fnmatchcase(candidate, pattern) for pattern in patterns for candidate in candidates)
+
+
 @dataclasses.dataclass
 class Scan:
     base: str
     output_file: str
+    output_format: OutputFormat = OutputFormat.json_pp
+    compression: Compression = Compression.none
+    priority: int = 1
+    previous_result: Optional[str] = None
+    archive: bool = False
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+    max_file_size: Optional[int] = None
+    scanners: Optional[tuple[Scanner, ...]] = None
+    license_text: bool = True
+    license_diagnostics: bool = True
+    license_text_diagnostics: bool = True
     uuid: uuid = field(init=False, default_factory=uuid.uuid4)
 
-    async def create_events(self):
-        for _root, dirs, files in os.walk(self.base, topdown=False):
-            for name in files:
-                full_path = os.path.join(_root, name)
-                if skip_ignored(full_path):
+    @property
+    def options(self) -> dict:
+        """The filters and options of this scan which differ from the defaults, for the header of the report. The
+        selected scanners are part of the fingerprint of the scanners in the header already.
+        """
+        options = {}
+        for name in ("include", "exclude"):
+            if value := getattr(self, name):
+                options[name] = list(value)
+        if self.max_file_size is not None:
+            options["max_file_size"] = self.max_file_size
+        for name in ("license_text", "license_diagnostics", "license_text_diagnostics"):
+            if not getattr(self, name):
+                options[name] = False
+        return options
+
+    def selects(self, path: str, size: Optional[int]) -> bool:
+        """Return True if the file at the `path` relative to the scanned root and of `size` bytes is to be scanned."""
+        if self.max_file_size is not None and (size or 0) > self.max_file_size:
+            return False
+        relative = path.partition("/")[2] or path
+        if self.include and not matches(relative, self.include):
+            return False
+        return not matches(relative, self.exclude)
+
+    async def create_events(self, codebase: Codebase, members: ArchiveMembers = None, progress: ScanProgress = None):
+        """Create an event for each file of `codebase`. The codebase was created from a walk of `base` already,
+        which skipped ignored files, so there is no need to walk the filesystem again. It also holds the size of
+        each file, so the files are not accessed again on the event loop.
+
+        If `base` is an archive, the events are created from its `members` instead, in the order of the archive.
+
+        Files not selected by the include and exclude patterns or larger than `max_file_size` are marked as
+        filtered and not scanned, so they are left out of the report. So are the directories left without any
+        selected file, like excluded trees.
+        """
+        if members:
+            async for event in self.create_archive_events(codebase, members, progress):
+                yield event
+        else:
+            for resource in codebase.walk(topdown=False):
+                if not resource.is_file:
                     continue
-                yield ScanEvent(uuid=self.uuid, location=full_path,
-                                relative_path=compute_scanroot_relative(full_path, self.base))
+                if not self.selects(resource.path, resource.size):
+                    self.mark_filtered(codebase, resource, progress)
+                    continue
+                yield ScanEvent(uuid=self.uuid, location=resource.location, relative_path=resource.path,
+                                priority=self.priority, size=resource.size)
+        if self.include or self.exclude or self.max_file_size is not None:
+            self.mark_filtered_directories(codebase)
 
+    async def create_archive_events(self, codebase: Codebase, members: ArchiveMembers, progress: ScanProgress = None):
+        loop = asyncio.get_running_loop()
+        root = codebase.root.path
+        iterator = iter(members)
+        pending = None
+        try:
+            while True:
+                # Shielded, so a cancelled scan still knows when the thread is done with the archive.
+                pending = loop.run_in_executor(None, next, iterator, None)
+                member = await asyncio.shield(pending)
+                pending = None
+                if not member:
+                    break
+                path, location = member
+                relative_path = f"{root}/{path}"
+                member = codebase.get_resource(relative_path)
+                if not self.selects(relative_path, member.size if member else None):
+                    ArchiveMembers.release(location)
+                    self.mark_filtered(codebase, member, progress)
+                    continue
+                yield ScanEvent(uuid=self.uuid, location=location, relative_path=relative_path,
+                                priority=self.priority, temporary=True, size=member.size if member else None)
+        finally:
+            # The iterator can not be closed while the thread is still reading the next member.
+            if pending is not None and not pending.done():
+                await asyncio.wait([pending])
+            iterator.close()
 
-@dataclasses.dataclass
-class FileScan(Scan):
+    @staticmethod
+    def mark_filtered_directories(codebase: Codebase) -> None:
+        """Mark all directories below the root without any file which is not filtered as filtered."""
+        selected = set()
+        for resource in codebase.walk(topdown=False, skip_root=True):
+            if resource.is_file and resource.is_filtered:
+                continue
+            if resource.is_file or resource.path in selected:
+                selected.add(posixpath.dirname(resource.path))
+                continue
+            resource.is_filtered = True
+            codebase.save_resource(resource)
 
-    async def create_events(self):
-        yield ScanEvent(uuid=self.uuid, location=str(self.base),
-                        relative_path=compute_scanroot_relative(self.base, self.base))
+    @staticmethod
+    def mark_filtered(codebase: Codebase, filtered: Resource, progress: ScanProgress = None) -> None:
+        if filtered:
+            filtered.is_filtered = True
+            codebase.save_resource(filtered)
+        if progress:
+            progress.files_filtered += 1
 
 
 @dataclasses.dataclass
@@ -77,77 +211,724 @@ class ScanEvent:
     uuid: str
     location: str
     relative_path: str
+    priority: int = 1
+    temporary: bool = False
+    digest: Optional[str] = None
+    size: Optional[int] = None
 
 
 class AsynchronousScan:
 
-    def __init__(self, scanners: list[Callable] = None, processes: int = 6, delta_t: int = 10):
+    def __init__(self, scanners: list[Callable] = None, processes: int = 6, delta_t: int = 10,
+                 result_cache: ResultCache = None, max_in_flight: int = 64, queue_depth: int = 1024,
+                 jobs: JobRegistry = None, delta_t_per_mib: float = 0, small_file_size: int = 16 * 1024,
+                 batch_files: int = 32, batch_bytes: int = 256 * 1024, initializer: Callable = None,
+                 archive_memory_limit: int = 1024 * 1024, lightweight: Collection[str] = (),
+                 deduplicate: bool = True, crash_retries: int = 1, recycle_tasks: int = 0, recycle_uss: int = 0,
+                 memory_check_interval: float = 5):
         log.info(f"Configuring number of processes to: {processes}.")
-        log.info(f"Configuring delta_t for scan deadlines to: {delta_t}.")
-        self.executor = ProcessPoolExecutor(processes)
+        log.info(f"Configuring delta_t for scan deadlines to: {delta_t} plus {delta_t_per_mib} per MiB.")
+        log.info(f"Configuring {max_in_flight} files in flight and a queue depth of {queue_depth} per scan.")
+        log.info(f"Configuring batches of up to {batch_files} files and {batch_bytes} bytes for files up to "
+                 f"{small_file_size} bytes.")
+        log.info(f"Configuring lightweight scans for files classified as {', '.join(lightweight) or 'none'}.")
+        log.info(f"Configuring recycling of workers after {recycle_tasks or 'unlimited'} jobs or at "
+                 f"{recycle_uss or 'unlimited'} bytes USS.")
+        if not scanners:
+            scanners = [get_file_info, get_licenses, allrights_scanner]
+            initializer = initializer or initialize_worker
+        self.processes = processes
+        self.initializer = initializer
+        self.scanners = scanners
+        self.executor = self.create_executor(processes)
+        self.isolation_executor = None
+        self.isolation_lock = asyncio.Lock()
+        self.crash_retries = crash_retries
+        self.recycle_tasks = recycle_tasks
+        self.recycle_uss = recycle_uss
+        self.tasks_run = 0
+        self.memory_check_interval = memory_check_interval
+        self.memory_checked = 0.0
+        self.memory_check: Optional[asyncio.Task] = None
+        self.worker_memory: dict[int, Optional[int]] = {}
+        self.scheduler = FairScheduler(processes)
+        metrics.pool_busy_workers.set_function(lambda: self.scheduler.running)
+        metrics.pool_queue_depth.set_function(lambda: self.scheduler.waiting)
+        metrics.worker_uss_bytes.set_function(
+            lambda: {(pid,): uss for pid, uss in self.worker_memory.items() if uss is not None})
         self.thread_executor = ThreadPoolExecutor(2)
+        # Post-processing takes long for large codebases, so it does not share the threads of the other steps.
+        self.postprocessing_executor = ThreadPoolExecutor(processes, thread_name_prefix="post-processing")
         self.delta_t = delta_t
-        if not scanners:
-            self.scanners = [get_file_info, get_licenses, allrights_scanner]
-        else:
-            self.scanners = scanners
+        self.delta_t_per_mib = delta_t_per_mib
+        self.max_in_flight = max_in_flight
+        self.queue_depth = queue_depth
+        self.small_file_size = small_file_size
+        self.batch_files = batch_files
+        self.batch_bytes = batch_bytes
+        self.archive_memory_limit = archive_memory_limit
+        self.deduplicate = deduplicate
+        self.result_cache = result_cache
+        self.lightweight = tuple(sorted(lightweight))
+        self.cache_namespace = self.namespace_for(self.scanners)
+        self.jobs = jobs
+        self.progress: dict[str, ScanProgress] = {}
+        self.results: dict[str, ResultLog] = {}
+        self.partial_results: set[str] = set()
+
+    def create_executor(self, processes: int) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(processes, mp_context=fork_context(), initializer=self.initializer,
+                                   initargs=(self.scanners,) if self.initializer else ())
+
+    def rebuild_executor(self, broken: ProcessPoolExecutor) -> None:
+        """Replace the process pool after a worker died. All scans share the pool, so only the first of the failed
+        jobs noticing the `broken` pool replaces it.
+        """
+        if self.executor is not broken:
+            return
+        log.error("A worker process died, restarting the process pool.")
+        metrics.pool_restarts.inc()
+        self.executor = self.create_executor(self.processes)
+        self.tasks_run = 0
+        self.worker_memory = {}
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def worker_uss(self) -> dict[int, Optional[int]]:
+        """Return the unique set size in bytes of each worker process of the pool, None if it is unknown."""
+        processes = getattr(self.executor, "_processes", None) or {}
+        return {pid: process_uss(pid) for pid in list(processes)}
+
+    async def refresh_worker_memory(self) -> dict[int, Optional[int]]:
+        """Return the unique set size of each worker. Reading it takes several milliseconds per worker holding the
+        license index, so it is read in a thread and at most every `memory_check_interval` seconds.
+        """
+        if time.monotonic() - self.memory_checked >= self.memory_check_interval:
+            self.memory_checked = time.monotonic()
+            executor = self.executor
+            worker_memory = await asyncio.get_running_loop().run_in_executor(None, self.worker_uss)
+            if executor is self.executor:
+                self.worker_memory = worker_memory
+        return self.worker_memory
+
+    async def check_memory(self) -> None:
+        await self.refresh_worker_memory()
+        self.recycle_executor()
+
+    def recycle_reason(self) -> Optional[str]:
+        """Return why the workers are to be replaced, if they ran `recycle_tasks` jobs each on average or one of
+        them used more than `recycle_uss` bytes of private memory when last checked.
+        """
+        if self.recycle_tasks and self.tasks_run >= self.recycle_tasks * self.processes:
+            return "tasks"
+        if self.recycle_uss and any(uss and uss > self.recycle_uss for uss in self.worker_memory.values()):
+            return "memory"
+        return None
+
+    def recycle_executor(self) -> None:
+        """Replace the process pool if its workers are due for recycling, so memory accumulated by the workers, e.g.
+        in caches of the scanners, is returned to the system.
+
+        New jobs go to the new pool right away. The old pool is shut down without cancelling anything: its workers
+        finish the jobs already submitted to them and exit then, so no queued work is lost.
+        """
+        if not (reason := self.recycle_reason()):
+            return
+        log.info(f"Recycling the worker processes after {self.tasks_run} jobs ({reason}).")
+        metrics.pool_recycles.inc(reason=reason)
+        retired, self.executor = self.executor, self.create_executor(self.processes)
+        self.tasks_run = 0
+        self.worker_memory = {}
+        retired.shutdown(wait=False)
+
+    async def warm_up(self) -> None:
+        """Start all worker processes and wait until each has run its initializer. The initializer runs in this
+        process first, so forked workers share what it loaded. Objects of this process are frozen before forking, so
+        the garbage collector does not copy the pages shared with the workers.
+        """
+        start = time.perf_counter()
+        if self.initializer:
+            self.initializer(self.scanners)
+        gc.freeze()
+        loop = asyncio.get_running_loop()
+        ready = set()
+        while len(ready) < self.processes:
+            ready.update(await asyncio.gather(
+                *[loop.run_in_executor(self.executor, worker_ready) for _ in range(self.processes)]))
+        log.info(f"Started {len(ready)} worker processes. Time elapsed: {time.perf_counter() - start}")
 
     def shutdown(self):
         log.error("Shutdown executor.")
         self.executor.shutdown(cancel_futures=True)
+        if self.isolation_executor:
+            self.isolation_executor.shutdown(cancel_futures=True)
+
+    async def write_json(self, writer: StreamingJsonWriter, codebase: Codebase) -> None:
+        def finish():
+            try:
+                writer.close(codebase)
+            except BaseException:
+                writer.abort()
+                raise
+
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.thread_executor, timings(finish))
+        metrics.json_write_seconds.observe(time.perf_counter() - start)
+
+    def set_state(self, single_scan: Scan, state: JobState, error: str = None) -> None:
+        if self.jobs:
+            self.jobs.update(single_scan.uuid, state, error)
 
-    def write_json(self, json_file: Path, codebase: Codebase) -> None:
-        plugin = JsonPrettyOutput()
-        runner = timings(
-            partial(make_atomic(plugin.process_codebase), output_json_pp=str(json_file), info=True, codebase=codebase))
-        self.thread_executor.submit(runner)
+    def results_for(self, uuid) -> ResultLog:
+        """Return the log of merged results of the scan `uuid`, which is created with the first call."""
+        return self.results.setdefault(str(uuid), ResultLog())
 
     async def __call__(self, single_scan: Scan) -> None:
+        self.progress[str(single_scan.uuid)] = ScanProgress()
+        self.results_for(single_scan.uuid)
+        metrics.scans_in_flight.inc()
+        try:
+            await self.run(single_scan)
+        except asyncio.CancelledError:
+            log.warning(f"Scan with uuid {single_scan.uuid} cancelled.")
+            self.set_state(single_scan, JobState.cancelled)
+            raise
+        except BaseException as e:
+            self.set_state(single_scan, JobState.failed, error=repr(e))
+            raise
+        else:
+            self.set_state(single_scan, JobState.done)
+        finally:
+            self.progress.pop(str(single_scan.uuid), None)
+            self.forget(single_scan.uuid)
+            self.scheduler.forget(str(single_scan.uuid))
+            metrics.scans_in_flight.dec()
+
+    def forget(self, uuid) -> None:
+        """Finish and drop the log of merged results of the scan `uuid`, so its streams end, and whether to write its
+        partial result. Also called for scans cancelled before they started.
+        """
+        self.partial_results.discard(str(uuid))
+        if results := self.results.pop(str(uuid), None):
+            results.finish()
+
+    async def run(self, single_scan: Scan) -> None:
         start = time.perf_counter()
         start_time = time2tstamp()
-        codebase = await run_in_threadpool(resource.create_codebase, single_scan.base)
-        await self.scan_files(single_scan, codebase)
-        codebase.update_header(start_timestamp=start_time, end_timestamp=time2tstamp(),
-                               duration=time.perf_counter() - start,
-                               options=dict(base=str(single_scan.base), output_file=str(single_scan.output_file)))
-        await self.add_license_detections(codebase)
-        self.write_json(single_scan.output_file, codebase)
+        self.set_state(single_scan, JobState.scanning)
+        members = None
+        if single_scan.archive:
+            members = ArchiveMembers(single_scan.base, self.archive_memory_limit)
+            try:
+                codebase = await run_in_threadpool(resource.create_archive_codebase, members.name, members.list())
+            except BaseException:
+                members.close()
+                raise
+        else:
+            codebase = await run_in_threadpool(resource.create_codebase, single_scan.base, True)
+        if progress := self.progress.get(str(single_scan.uuid)):
+            progress.files_discovered = codebase.counters["initial:files_count"]
+        previous = None
+        namespace = self.namespace_for(self.scanners_for(single_scan))
+        if single_scan.previous_result:
+            previous = await run_in_threadpool(PreviousResult.load, single_scan.previous_result,
+                                               namespace, [*resource.resource_attributes(), "size"])
+        options = dict(base=str(single_scan.base), output_file=str(single_scan.output_file),
+                       scanners=namespace, **single_scan.options)
+        if single_scan.previous_result:
+            options.update(previous_result=str(single_scan.previous_result))
+        if single_scan.archive:
+            options.update(archive=True)
+        writer = create_writer(single_scan.output_file, single_scan.output_format, single_scan.compression)
+        cancelled = False
+        try:
+            try:
+                await self.scan_files(single_scan, codebase, writer, previous, members)
+            finally:
+                if members:
+                    members.close()
+        except asyncio.CancelledError:
+            if str(single_scan.uuid) not in self.partial_results:
+                writer.abort()
+                raise
+            log.warning(f"Scan with uuid {single_scan.uuid} was cancelled, writing the results merged so far.")
+            cancelled = True
+        except BaseException:
+            writer.abort()
+            raise
+        try:
+            codebase.update_header(start_timestamp=start_time, end_timestamp=time2tstamp(),
+                                   duration=time.perf_counter() - start, options=options)
+            self.add_deadline_exceeded(codebase, self.progress.get(str(single_scan.uuid)))
+            self.add_deduplication(codebase, self.progress.get(str(single_scan.uuid)))
+            self.add_quarantined(codebase, self.progress.get(str(single_scan.uuid)))
+            if cancelled:
+                codebase.get_or_create_current_header().extra_data["cancelled"] = True
+            else:
+                self.set_state(single_scan, JobState.post_processing)
+                if single_scan.scanners is None or Scanner.licenses in single_scan.scanners:
+                    await self.add_license_detections(codebase, single_scan.license_text,
+                                                      single_scan.license_diagnostics,
+                                                      single_scan.license_text_diagnostics,
+                                                      str(single_scan.uuid), single_scan.priority)
+        except BaseException:
+            writer.abort()
+            raise
+        self.set_state(single_scan, JobState.writing)
+        await self.write_json(writer, codebase)
+        if cancelled:
+            raise asyncio.CancelledError()
         log.info(f"Scan with uuid {single_scan.uuid} has total scan time: {time.perf_counter() - start}")
 
     @staticmethod
-    async def add_license_detections(codebase):
-        LicenseScanner().process_codebase(codebase, license_text=True, license_diagnostics=True,
-                                          license_text_diagnostics=True)
-
-    async def scan_files(self, single_scan: Scan, codebase: Codebase) -> None:
-        async with MergeThread(codebase) as codebase:
-            tasks = []
-            async for single_file in single_scan.create_events():
-                tasks.append(
-                    self.scan_file(single_file, codebase.write)
-                )
-            await asyncio.gather(*tasks)
-
-    async def scan_file(self, single_file: ScanEvent, write):
-        log.debug(f"File {single_file.relative_path} scan {single_file.uuid} requested for.")
+    def add_deadline_exceeded(codebase: Codebase, progress: ScanProgress = None) -> None:
+        """List the files for which a scanner exceeded its deadline in the header, so they can be scanned again."""
+        if not progress or not progress.deadline_exceeded:
+            return
+        log.warning(f"Deadline exceeded for {len(progress.deadline_exceeded)} files.")
+        extra_data = codebase.get_or_create_current_header().extra_data
+        extra_data["deadline_exceeded"] = [dict(path=path, scanners=scanners)
+                                           for path, scanners in sorted(progress.deadline_exceeded.items())]
+
+    @staticmethod
+    def add_quarantined(codebase: Codebase, progress: ScanProgress = None) -> None:
+        """List the files which repeatedly crashed a worker in the header. They have no results but a scan error."""
+        if not progress or not progress.quarantined:
+            return
+        log.warning(f"Quarantined {len(progress.quarantined)} files.")
+        extra_data = codebase.get_or_create_current_header().extra_data
+        extra_data["quarantined"] = sorted(progress.quarantined)
+
+    @staticmethod
+    def add_deduplication(codebase: Codebase, progress: ScanProgress = None) -> None:
+        """Add the share of files which got the result of another file with the same content to the header."""
+        if not progress or not progress.files_scanned:
+            return
+        extra_data = codebase.get_or_create_current_header().extra_data
+        extra_data["deduplication"] = dict(files=progress.files_scanned, duplicates=progress.files_duplicate,
+                                           ratio=progress.files_duplicate / progress.files_scanned)
+
+    async def add_license_detections(self, codebase, license_text: bool = True, license_diagnostics: bool = True,
+                                     license_text_diagnostics: bool = True, key: str = None, priority: int = 1):
+        """Post-process the license detections of `codebase` in a thread of its own, so the event loop and the other
+        scans keep going meanwhile. Its jobs for the process pool are admitted by the scheduler like the files of the
+        scan `key`. The time taken is added to the timings in the header of the scan report.
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        executor = SchedulingExecutor(self, loop, key, priority)
+        await loop.run_in_executor(self.postprocessing_executor, partial(
+            postprocessing.add_license_detections, codebase, executor, license_text=license_text,
+            license_diagnostics=license_diagnostics, license_text_diagnostics=license_text_diagnostics))
+        extra_data = codebase.get_or_create_current_header().extra_data
+        extra_data.setdefault("timings", {})["license_detections"] = time.perf_counter() - start
+
+    async def scan_files(self, single_scan: Scan, codebase: Codebase, writer: StreamingJsonWriter = None,
+                         previous: PreviousResult = None, members: ArchiveMembers = None) -> None:
+        """Scan all files of `single_scan` while its events are still created. At most `queue_depth` batches are
+        waiting to be scanned and at most `max_in_flight` batches are scanned at the same time, so the memory used
+        does not depend on the size of the scanned tree.
+
+        Files up to `small_file_size` bytes are grouped into batches of at most `batch_files` files and
+        `batch_bytes` bytes, each scanned by a single job of the process pool. Larger files are scanned alone.
+
+        Files unchanged since the `previous` result are not scanned; their previous results are merged instead.
+
+        If `single_scan` is an archive, its `members` are scanned. The temporary copy of each member is removed as
+        soon as it is scanned.
+
+        Files with the same content are scanned once, the others get a copy of the result, see `unique_files`.
+        """
+        events = asyncio.Queue(maxsize=self.queue_depth)
+        batch_files = self.batch_files_for(codebase)
+        progress = self.progress.get(str(single_scan.uuid))
+        scanners = self.scanners_for(single_scan)
+        dedup = Deduplicator() if self.deduplicate else None
+
+        def sharing(write):
+            if not dedup:
+                return write
+
+            async def write_and_share(relative_path: str, result: dict):
+                duplicates = dedup.resolve(relative_path, result)
+                await asyncio.gather(write(relative_path, result),
+                                     self.copy_results(duplicates, relative_path, result, write, progress))
+
+            return write_and_share
+
+        async def produce(write):
+            batch, batch_bytes = [], 0
+            changed = single_scan.create_events(codebase, members, progress)
+            if previous:
+                changed = self.changed_files(changed, previous, write, progress)
+            if dedup:
+                changed = self.unique_files(changed, dedup, write, progress)
+            async for single_file in changed:
+                size = self.small_size(single_file) if batch_files > 1 else None
+                if size is None:
+                    await events.put([single_file])
+                    continue
+                batch.append(single_file)
+                batch_bytes += size
+                if len(batch) >= batch_files or batch_bytes >= self.batch_bytes:
+                    await events.put(batch)
+                    batch, batch_bytes = [], 0
+            if batch:
+                await events.put(batch)
+            for _ in range(self.max_in_flight):
+                await events.put(None)
+
+        async def consume(write):
+            while batch := await events.get():
+                try:
+                    if len(batch) == 1:
+                        await self.scan_file(batch[0], write, scanners)
+                    else:
+                        await self.scan_batch(batch, write, scanners)
+                finally:
+                    release(batch)
+
+        results = self.results.get(str(single_scan.uuid))
+        async with MergeThread(codebase, writer=writer, progress=progress, results=results) as merge_thread:
+            pipeline = [asyncio.create_task(produce(merge_thread.write))]
+            pipeline.extend(asyncio.create_task(consume(sharing(merge_thread.write)))
+                            for _ in range(self.max_in_flight))
+            try:
+                await asyncio.gather(*pipeline)
+            except BaseException:
+                for task in pipeline:
+                    task.cancel()
+                # Wait until the cancelled files left the scheduler and the executor, so the workers are free again.
+                await asyncio.gather(*pipeline, return_exceptions=True)
+                raise
+
+    async def changed_files(self, events, previous: PreviousResult, write, progress: ScanProgress = None,
+                            chunk_size: int = 256):
+        """Yield the events of all files which changed since the `previous` result. The previous results of all other
+        files are written right away. Files are compared in chunks in a thread, as this reads the whole file.
+        """
+        loop = asyncio.get_running_loop()
+        chunk = []
+
+        async def compare():
+            results = await loop.run_in_executor(self.thread_executor, previous.lookup_all,
+                                                 [(e.relative_path, e.location) for e in chunk])
+            unchanged = []
+            for single_file, result in zip(chunk, results):
+                if result is None:
+                    continue
+                if progress:
+                    progress.scanned(result, unchanged=True)
+                unchanged.append(write(single_file.relative_path, result))
+            await asyncio.gather(*unchanged)
+            release([single_file for single_file, result in zip(chunk, results) if result is not None])
+            return [single_file for single_file, result in zip(chunk, results) if result is None]
+
+        async for single_file in events:
+            chunk.append(single_file)
+            if len(chunk) >= chunk_size:
+                for changed in await compare():
+                    yield changed
+                chunk = []
+        if chunk:
+            for changed in await compare():
+                yield changed
+
+    def namespace_for(self, scanners: list[Callable]) -> str:
+        """Return the fingerprint of `scanners`. Files routed to the lightweight scanners get fewer results, so the
+        routing policy is part of it.
+        """
+        if self.lightweight:
+            return fingerprint(scanners, "lightweight", *self.lightweight)
+        return fingerprint(scanners)
+
+    async def unique_files(self, events, dedup: Deduplicator, write, progress: ScanProgress = None,
+                           chunk_size: int = 256):
+        """Yield the events of all files with a content not seen before in this scan. Files are hashed in chunks in a
+        thread of the default executor, not in the threads shared with writing the reports. A duplicate gets a copy of the result of the first file with the same content, right away if that
+        result is known already, otherwise as soon as it is written.
+        """
+        loop = asyncio.get_running_loop()
+        chunk = []
+
+        async def deduplicate():
+            digests = await loop.run_in_executor(None, content_digests,
+                                                 [single_file.location for single_file in chunk])
+            unique, copies = [], []
+            for single_file, digest in zip(chunk, digests):
+                single_file.digest = digest
+                scan, primary = dedup.add(single_file.relative_path, digest, single_file)
+                if scan:
+                    unique.append(single_file)
+                elif primary:
+                    copies.append(self.copy_results([single_file], *primary, write, progress))
+            await asyncio.gather(*copies)
+            return unique
+
+        async for single_file in events:
+            chunk.append(single_file)
+            if len(chunk) >= chunk_size:
+                for unique in await deduplicate():
+                    yield unique
+                chunk = []
+        if chunk:
+            for unique in await deduplicate():
+                yield unique
+
+    @staticmethod
+    async def copy_results(duplicates: list[ScanEvent], primary: str, result: dict, write,
+                           progress: ScanProgress = None) -> None:
+        """Write a copy of the `result` of the file at the `primary` path for each of the `duplicates`. The keys which
+        depend on the path, like the date and the programming language derived from the name, are determined for each
+        duplicate in a thread.
+        """
+        if not duplicates:
+            return
+        deadline_exceeded = progress.deadline_exceeded.get(primary) if progress else None
+        quarantined = progress and primary in progress.quarantined
+        loop = asyncio.get_running_loop()
+        copied = await loop.run_in_executor(None, copy_result, result, [d.location for d in duplicates])
+        copies = []
+        for single_file, duplicate in zip(duplicates, copied):
+            if progress:
+                progress.scanned(duplicate, duplicate=True)
+                if deadline_exceeded:
+                    progress.deadline_exceeded[single_file.relative_path] = deadline_exceeded
+                if quarantined:
+                    progress.quarantined.append(single_file.relative_path)
+            copies.append(write(single_file.relative_path, duplicate))
+        try:
+            await asyncio.gather(*copies)
+        finally:
+            release(duplicates)
+
+    def scanners_for(self, single_scan: Scan) -> list[Callable]:
+        """Return the scanners selected by `single_scan`, by default all scanners of the service."""
+        if single_scan.scanners is None:
+            return self.scanners
+        return [SCANNERS[scanner] for scanner in Scanner if scanner in single_scan.scanners]
+
+    def batch_files_for(self, codebase: Codebase) -> int:
+        """Return the number of files per batch for `codebase`. Batches of a small codebase are kept small, so each
+        process still gets several batches to scan.
+        """
+        files = codebase.counters.get("initial:files_count", 0)
+        return min(self.batch_files, max(1, files // (self.scheduler.slots * 4)))
+
+    def small_size(self, single_file: ScanEvent) -> Optional[int]:
+        """Return the size of `single_file` if it may be batched with other files, otherwise None. The size is taken
+        from the codebase, a file of unknown size is scanned alone.
+        """
+        if single_file.size is None or single_file.size > self.small_file_size:
+            return None
+        return single_file.size
+
+    async def scan_file(self, single_file: ScanEvent, write, scanners: list[Callable] = None):
+        await self.scan_batch([single_file], write, scanners)
+
+    async def scan_batch(self, batch: list[ScanEvent], write, scanners: list[Callable] = None):
+        """Scan the files of `batch`, all belonging to the same scan, with a single job of the process pool.
+        Results found in the result cache are written right away. The files are scanned with the selected
+        `scanners`, by default with all scanners of the service.
+        """
+        scanners = scanners or self.scanners
+        namespace = self.namespace_for(scanners)
+        for single_file in batch:
+            log.debug(f"File {single_file.relative_path} scan {single_file.uuid} requested for.")
 
         loop = asyncio.get_event_loop()
-        single_file_task = [loop.run_in_executor(self.executor, partial(_scan, deadline=self.calculate_deadline()), single_file.location) for _scan in self.scanners]
-        results = await asyncio.gather(*single_file_task)
-        result = reduce(operator.ior, results, {})
-        await write(single_file.relative_path, result)
+        progress = self.progress.get(str(batch[0].uuid))
+        pending = [(single_file, None) for single_file in batch]
+        if self.result_cache:
+            locations = [single_file.location for single_file in batch]
+            digests = [single_file.digest for single_file in batch]
+            lookups = await loop.run_in_executor(None, partial(self.lookup_results, locations, namespace, digests))
+            pending, cached = [], []
+            for single_file, (cache_key, result) in zip(batch, lookups):
+                if result is None:
+                    pending.append((single_file, cache_key))
+                    continue
+                log.debug(f"File {single_file.relative_path} scan {single_file.uuid} found in result cache.")
+                if progress:
+                    progress.scanned(result, cached=True)
+                cached.append(write(single_file.relative_path, result))
+            await asyncio.gather(*cached)
+        if not pending:
+            return
+
+        outcomes = await self.scan_in_pool([single_file.location for single_file, _ in pending],
+                                           str(batch[0].uuid), batch[0].priority, scanners)
+        cacheable, scanned = [], []
+        for (single_file, cache_key), (result, deadline_exceeded, quarantined) in zip(pending, outcomes):
+            if progress:
+                progress.scanned(result)
+                if deadline_exceeded:
+                    progress.deadline_exceeded[single_file.relative_path] = deadline_exceeded
+                if quarantined:
+                    progress.quarantined.append(single_file.relative_path)
+            if cache_key and not result.get("scan_errors") and not deadline_exceeded:
+                cacheable.append((cache_key, result))
+            scanned.append(write(single_file.relative_path, result))
+        if cacheable:
+            await loop.run_in_executor(None, partial(self.store_results, cacheable))
+        await asyncio.gather(*scanned)
+
+    def lookup_results(self, locations: list[str], namespace: str = None,
+                       digests: list[Optional[str]] = None) -> list[tuple]:
+        """Look up the results of the files at `locations`. The content `digests` computed for deduplication are
+        reused, so each file is hashed once.
+        """
+        namespace = namespace or self.cache_namespace
+        digests = digests or [None] * len(locations)
+        return [self.result_cache.lookup(location, namespace, digest) for location, digest in zip(locations, digests)]
+
+    def store_results(self, results: list[tuple[str, dict]]) -> None:
+        for cache_key, result in results:
+            self.result_cache.put(cache_key, result)
+
+    async def scan_in_pool(self, locations: list[str], key: str = None, priority: int = 1,
+                           scanners: list[Callable] = None) -> list[tuple[dict, list[str], bool]]:
+        """Scan the files at `locations` with a single job of the process pool and record the execution time of each
+        scanner. Return the result of each file, the names of the scanners which exceeded their deadline and whether
+        the file was quarantined.
+
+        The pool is shared by all scans. The scheduler admits files of the scan `key` according to its `priority`,
+        so a small scan is not queued behind all files of a large one.
+
+        If a worker dies, e.g. by a crash of native code or the OOM killer, the pool is replaced and the files of the
+        failed job are scanned again one by one, see `scan_isolated`.
+        """
+        loop = asyncio.get_running_loop()
+        scanners = scanners or self.scanners
+        async with self.scheduler.slot(key, priority):
+            executor = self.executor
+            try:
+                outcomes = await loop.run_in_executor(executor, timed_scan_resources, locations, scanners,
+                                                      self.delta_t, self.delta_t_per_mib, self.lightweight)
+            except BrokenProcessPool:
+                self.rebuild_executor(executor)
+                outcomes = None
+            else:
+                self.job_done(executor)
+        if outcomes is None:
+            outcomes = [await self.scan_isolated(location, scanners) for location in locations]
+        results = []
+        for outcome in outcomes:
+            if outcome is None:
+                results.append((quarantine_result(), [], True))
+                continue
+            result, measurements = outcome
+            exceeded = []
+            for name, seconds, deadline_exceeded in measurements:
+                metrics.scanner_seconds.observe(seconds, scanner=name)
+                if deadline_exceeded:
+                    metrics.deadline_hits.inc(scanner=name)
+                    exceeded.append(name)
+            results.append((result, exceeded, False))
+        return results
+
+    async def run_in_pool(self, function: Callable, *args, key: str = None, priority: int = 1) -> Any:
+        """Call `function` with a job of the process pool, admitted by the scheduler like the files of the scan `key`.
+        If the pool broke due to a crash in another job or was shut down meanwhile, `function` is called in a thread
+        of the default executor instead. The caller may itself wait in a thread of another executor, so using that
+        one could deadlock.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.scheduler.slot(key, priority):
+            executor = self.executor
+            try:
+                result = await loop.run_in_executor(executor, function, *args)
+            except BrokenProcessPool:
+                self.rebuild_executor(executor)
+            except RuntimeError as e:
+                log.warning(f"Process pool not available, running {function} in a thread: {e}")
+            else:
+                self.job_done(executor)
+                return result
+        return await loop.run_in_executor(None, function, *args)
+
+    def job_done(self, executor: ProcessPoolExecutor) -> None:
+        """Count a finished job of `executor` towards recycling, unless the pool was replaced meanwhile. The memory of
+        the workers is checked in the background, if it is due.
+        """
+        if executor is not self.executor:
+            return
+        self.tasks_run += 1
+        self.recycle_executor()
+        if (self.recycle_uss and (not self.memory_check or self.memory_check.done())
+                and time.monotonic() - self.memory_checked >= self.memory_check_interval):
+            self.memory_check = asyncio.create_task(self.check_memory())
+
+    async def scan_isolated(self, location: str, scanners: list[Callable]) -> Optional[tuple[dict, list[tuple]]]:
+        """Scan a file of a job which crashed a worker in a separate single process pool, one file at a time, so a
+        crash there is caused by this file only. Return None if the file crashed the worker `crash_retries` times;
+        the file is quarantined then.
+        """
+        loop = asyncio.get_running_loop()
+        async with self.isolation_lock:
+            for _ in range(self.crash_retries):
+                if not self.isolation_executor:
+                    self.isolation_executor = self.create_executor(1)
+                try:
+                    outcomes = await loop.run_in_executor(self.isolation_executor, timed_scan_resources, [location],
+                                                          scanners, self.delta_t, self.delta_t_per_mib,
+                                                          self.lightweight)
+                    return outcomes[0]
+                except BrokenProcessPool:
+                    self.isolation_executor.shutdown(wait=False)
+                    self.isolation_executor = None
+        log.error(f"File {location} crashed the worker {self.crash_retries} times and is quarantined.")
+        metrics.files_quarantined.inc()
+        return None
+
 
-    def calculate_deadline(self):
-        return time.time() + int(self.delta_t)
+class SchedulingExecutor(Executor):
+    """Executor for a thread which runs each call with a job of the process pool of `scan`, admitted by its scheduler
+    for the scan `key`, see `AsynchronousScan.run_in_pool`. The jobs are submitted by the event `loop`.
+    """
+
+    def __init__(self, scan: AsynchronousScan, loop: asyncio.AbstractEventLoop, key: str = None, priority: int = 1):
+        self.scan = scan
+        self.loop = loop
+        self.key = key
+        self.priority = priority
+
+    def submit(self, fn, /, *args, **kwargs):
+        return asyncio.run_coroutine_threadsafe(
+            self.scan.run_in_pool(partial(fn, *args, **kwargs), key=self.key, priority=self.priority), self.loop)
 
 
 class MergeThread(Thread):
-    def __init__(self, codebase: Codebase):
+    """Merge scan results into the codebase. Results are queued by `write` and merged in batches of up to
+    `batch_size` results, so the thread hops between the event loop and this thread once per batch instead of
+    once per file. Several results for the same resource within a batch are merged into it at once.
+    """
+
+    def __init__(self, codebase: Codebase, batch_size: int = 256, writer: StreamingJsonWriter = None,
+                 progress: ScanProgress = None, results: ResultLog = None):
         super().__init__()
         self.codebase = codebase
-        self.loop = asyncio.new_event_loop()
+        self.writer = writer
+        self.progress = progress
+        self.results = results
+        self.batch_size = batch_size
+        self.pending = queue.SimpleQueue()
+        self.merged = 0
+        self.batches = 0
+        self.started = None
+
+    @property
+    def queue_depth(self) -> int:
+        return self.pending.qsize()
 
-    async def _write(self, at: str, result: dict):
+    @property
+    def merge_rate(self) -> float:
+        """Merged results per second since the thread was started."""
+        if not self.started:
+            return 0.0
+        return self.merged / max(time.perf_counter() - self.started, 1e-9)
+
+    def _merge(self, at: str, results: list[dict]):
         def merge(items, into):
             for k, v in items:
                 if not v:
@@ -158,30 +939,72 @@ class MergeThread(Thread):
         log.debug(f"Merging result for '{at}'")
         with_resource = self.codebase.get_resource(at)
         if not with_resource:
-            log.warning(f"Resource for {at} not found. Result is: {result.items()}")
+            log.warning(f"Resource for {at} not found. Result is: {[r.items() for r in results]}")
 
-        merge(result.items(), with_resource)
+        for result in results:
+            merge(result.items(), with_resource)
 
         self.codebase.save_resource(with_resource)
+        if self.writer:
+            self.writer.add(with_resource)
+
+    def _merge_batch(self, batch: list[tuple]):
+        if not batch:
+            return
+        by_path = defaultdict(list)
+        for at, result, future in batch:
+            by_path[at].append((result, future))
+
+        outcomes = defaultdict(list)
+        merged = []
+        for at, writes in by_path.items():
+            try:
+                self._merge(at, [result for result, _ in writes])
+                merged.append(at)
+                error = None
+            except Exception as e:
+                error = e
+            for _, future in writes:
+                outcomes[future.get_loop()].append((future, error))
+
+        self.merged += len(batch)
+        self.batches += 1
+        if self.progress:
+            self.progress.files_merged = self.merged
+        if self.results is not None:
+            self.results.add(self.codebase, merged)
+        for loop, resolved in outcomes.items():
+            try:
+                loop.call_soon_threadsafe(_resolve, resolved)
+            except RuntimeError:
+                log.warning("Results were merged after their event loop was closed.")
 
     async def write(self, resource_path: str, result: dict):
-        coro = self._write(resource_path, result)
-        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
-        await asyncio.wrap_future(future)
+        start = time.perf_counter()
+        future = asyncio.get_running_loop().create_future()
+        self.pending.put((resource_path, result, future))
+        await future
+        metrics.merge_seconds.observe(time.perf_counter() - start)
 
     def run(self):
-        asyncio.set_event_loop(self.loop)
-        self.loop.run_forever()
-        self.loop.run_until_complete(asyncio.sleep(0))
-        self.loop.close()
-
-    async def internal_stop(self):
-        self.loop.stop()
+        self.started = time.perf_counter()
+        stopped = False
+        while not stopped:
+            batch = [self.pending.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.pending.get_nowait())
+                except queue.Empty:
+                    break
+            stops = [item for item in batch if item[0] is None]
+            self._merge_batch([item for item in batch if item[0] is not None])
+            for _, _, future in stops:
+                future.get_loop().call_soon_threadsafe(_resolve, [(future, None)])
+            stopped = bool(stops)
+        log.debug(f"Merged {self.merged} results in {self.batches} batches with {self.merge_rate:.1f} results/s.")
 
     async def stop(self):
-        coro = self.internal_stop()
-        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
-        await asyncio.wrap_future(future)
+        await self.write(None, {})
 
     async def __aenter__(self):
         log.debug("Enter: Awaiting scan results for merging.")
@@ -194,12 +1017,64 @@ class MergeThread(Thread):
         await self.stop()
 
 
+def _resolve(outcomes: list[tuple]):
+    for future, error in outcomes:
+        if future.done():
+            continue
+        if error:
+            future.set_exception(error)
+        else:
+            future.set_result(None)
+
+
+def copy_result(result: dict, locations: list[str]) -> list[dict]:
+    """Return a copy of `result` for the file at each of `locations`, with the path dependent keys of that file."""
+    copies = []
+    for location in locations:
+        duplicate = copy.deepcopy(result)
+        refresh_path_dependent(duplicate, location)
+        copies.append(duplicate)
+    return copies
+
+
+def quarantine_result() -> dict:
+    return {"scan_errors": ["ERROR: file quarantined: the worker process died while scanning this file."]}
+
+
+def release(files: list[ScanEvent]) -> None:
+    """Remove the temporary copies of archive members once they are scanned."""
+    for single_file in files:
+        if single_file.temporary:
+            ArchiveMembers.release(single_file.location)
+
+
+def process_uss(pid: int) -> Optional[int]:
+    """Return the unique set size in bytes of the process `pid`, or None if it is not known on this platform. Unlike
+    the resident set size it leaves out the pages a forked worker still shares with the service, like the license
+    index, so it shows what the worker accumulated itself.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            fields = dict(line.split(":", 1) for line in f)
+        return sum(int(fields[name].split()[0]) for name in ("Private_Clean", "Private_Dirty")) * 1024
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def fork_context():
+    """Fork worker processes where possible, so they share the license index loaded by the service."""
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return None
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     start = time.perf_counter()
     from licensedcode.cache import populate_cache
     populate_cache()
     log.info(f"Cache initialized. Time elapsed: {time.perf_counter() - start}")
+    await scan.warm_up()
     yield
     scan.shutdown()
 
@@ -207,40 +1082,96 @@ async def lifespan(app: FastAPI):
 tasks = set()
 
 app = FastAPI(lifespan=lifespan)
-scan = AsynchronousScan(processes=settings.processes, delta_t=settings.delta_t)
+jobs = JobRegistry(settings.job_store, settings.job_retention)
+scan = AsynchronousScan(processes=settings.processes, delta_t=settings.delta_t,
+                        delta_t_per_mib=settings.delta_t_per_mib, small_file_size=settings.small_file_size,
+                        batch_files=settings.batch_files, batch_bytes=settings.batch_bytes,
+                        max_in_flight=settings.max_in_flight, queue_depth=settings.queue_depth, jobs=jobs,
+                        archive_memory_limit=settings.archive_memory_limit, lightweight=settings.lightweight_classes,
+                        deduplicate=settings.deduplicate, crash_retries=settings.crash_retries,
+                        recycle_tasks=settings.recycle_tasks, recycle_uss=settings.recycle_uss,
+                        result_cache=ResultCache(settings.result_cache, settings.result_cache_size)
+                        if settings.result_cache else None)
 
 
-async def execute(scan_request: "ScanRequest"):
+def create_scan(scan_request: "ScanRequest") -> Scan:
+    """Validate `scan_request` and create the scan for it."""
     scan_path = scan_request.scan_path
     output_file = scan_request.output_file
-    if os.path.isfile(scan_path):
-        single_scan = FileScan(scan_path, output_file)
-        log.info(f"Scan with uuid {single_scan.uuid}: Scanning file {single_scan.base}.")
-    elif os.path.isdir(scan_path):
-        single_scan = Scan(scan_path, output_file)
-        log.info(f"Scan with uuid {single_scan.uuid}: Scanning dir {single_scan.base}.")
-    else:
+    if not (os.path.isfile(scan_path) or os.path.isdir(scan_path)):
         raise HTTPException(400, f"File or directory '{scan_path}' of variable 'scan_path' not found.")
+    if not output.is_available(scan_request.compression):
+        raise HTTPException(400, f"Compression '{scan_request.compression.value}' is not available.")
+    previous_result = scan_request.previous_result
+    if previous_result and not os.path.isfile(previous_result):
+        raise HTTPException(400, f"File '{previous_result}' of variable 'previous_result' not found.")
+    if scan_request.archive and not is_archive(scan_path):
+        raise HTTPException(400, f"File '{scan_path}' of variable 'scan_path' is not a tar or zip archive.")
+    single_scan = Scan(scan_path, output_file, scan_request.output_format, scan_request.compression,
+                       scan_request.priority, previous_result, scan_request.archive,
+                       include=tuple(scan_request.include), exclude=tuple(scan_request.exclude),
+                       max_file_size=scan_request.max_file_size,
+                       scanners=tuple(scan_request.scanners) if scan_request.scanners is not None else None,
+                       license_text=scan_request.license_text, license_diagnostics=scan_request.license_diagnostics,
+                       license_text_diagnostics=scan_request.license_text_diagnostics)
+    kind = "archive" if scan_request.archive else "file" if os.path.isfile(scan_path) else "dir"
+    log.info(f"Scan with uuid {single_scan.uuid}: Scanning {kind} {single_scan.base}.")
     log.info(f"Writing scan result for {single_scan.uuid} into {single_scan.output_file}.")
+    return single_scan
+
+
+async def execute(scan_request: "ScanRequest"):
+    single_scan = create_scan(scan_request)
+    jobs.create(single_scan.uuid, single_scan.base, single_scan.output_file)
     await schedule_scan(single_scan)
     return single_scan.uuid
 
 
-async def schedule_scan(single_scan, default_scan=None):
+async def execute_batch(scan_requests: list["ScanRequest"]) -> tuple[uuid.UUID, list[uuid.UUID]]:
+    """Validate all `scan_requests` before any of them is scheduled, so a batch is accepted or rejected as a whole.
+    The scans are registered in one transaction. At most `batch_scans` scans of the batch run at the same time; all
+    of them share the process pool, the fair scheduler and the license index with all other scans.
+    """
+    single_scans = []
+    for index, scan_request in enumerate(scan_requests):
+        try:
+            single_scans.append(create_scan(scan_request))
+        except HTTPException as e:
+            raise HTTPException(e.status_code, f"Scan request {index}: {e.detail}") from e
+    batch = uuid.uuid4()
+    jobs.create_batch(batch, [(s.uuid, s.base, s.output_file) for s in single_scans])
+    log.info(f"Batch {batch} with {len(single_scans)} scans submitted.")
+    running = asyncio.Semaphore(settings.batch_scans)
+    for single_scan in single_scans:
+        await schedule_scan(single_scan, running=running)
+    return batch, [single_scan.uuid for single_scan in single_scans]
+
+
+async def schedule_scan(single_scan, default_scan=None, running: asyncio.Semaphore = None):
     if not default_scan:
         default_scan = scan
-    coro = default_scan(single_scan)
+
+    async def limited():
+        async with running:
+            await default_scan(single_scan)
+
+    coro = limited() if running else default_scan(single_scan)
     name = str(single_scan.uuid)
     await schedule_task(coro, name)
 
 
 async def schedule_task(coro, name):
     def discard(fut):
-        async def coro():
-            await asyncio.sleep(30)
-            tasks.discard(fut)
-
-        asyncio.create_task(coro())
+        tasks.discard(fut)
+        scan.forget(fut.get_name())
+        if fut.cancelled():
+            # A scan cancelled while it waited to start has not set a state itself.
+            job = jobs.get(fut.get_name())
+            if job and not JobState(job["status"]).finished:
+                jobs.update(fut.get_name(), JobState.cancelled)
+            return
+        if not fut.cancelled() and fut.exception():
+            log.error(f"Scan with uuid {fut.get_name()} failed.", exc_info=fut.exception())
 
     future = asyncio.create_task(coro, name=name)
     future.add_done_callback(discard)
@@ -250,6 +1181,18 @@ async def schedule_task(coro, name):
 class ScanRequest(BaseModel):
     scan_path: Path
     output_file: Path
+    output_format: OutputFormat = OutputFormat.json_pp
+    compression: Compression = Compression.none
+    priority: int = Field(default=1, ge=1, le=100)
+    previous_result: Optional[Path] = None
+    archive: bool = False
+    include: list[str] = []
+    exclude: list[str] = []
+    max_file_size: Optional[int] = Field(default=None, ge=0)
+    scanners: Optional[list[Scanner]] = Field(default=None, min_length=1)
+    license_text: bool = True
+    license_diagnostics: bool = True
+    license_text_diagnostics: bool = True
 
 
 @app.get("/scan")
@@ -259,12 +1202,32 @@ async def status():
 
 
 def get_task_status(uuid):
-    uuid = str(uuid)
-    task_dict = {task.get_name(): task for task in tasks}
-    if uuid not in task_dict:
+    job = jobs.get(uuid)
+    if not job:
         raise HTTPException(status_code=404, detail="UUID not found")
-    task = task_dict[uuid]
-    return dict(uuid=uuid, status="done" if task.done() else "pending")
+    return job
+
+
+def get_scan_progress(uuid):
+    job = get_task_status(uuid)
+    stages = job["stages"]
+    if not JobState(job["status"]).finished:
+        stages[job["status"]] = stages.get(job["status"], 0.0) + time.time() - job["updated"]
+    if progress := scan.progress.get(str(uuid)):
+        job.update(progress.to_dict())
+    return job
+
+
+@app.get("/scan/batch/{batch}")
+async def batch_status(batch: str):
+    scans = jobs.get_batch(batch)
+    if not scans:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    states = defaultdict(int)
+    for job in scans:
+        states[job["status"]] += 1
+    return {"batch": batch, "finished": all(JobState(job["status"]).finished for job in scans),
+            "states": states, "scans": scans}
 
 
 @app.get("/scan/{uuid}")
@@ -273,9 +1236,61 @@ async def status(uuid: str):
     return status_dict
 
 
+@app.get("/scan/{uuid}/progress")
+async def progress(uuid: str):
+    return get_scan_progress(uuid)
+
+
+@app.get("/scan/{uuid}/stream")
+async def stream(uuid: str, offset: int = Query(default=0, ge=0), format: StreamFormat = StreamFormat.ndjson,
+                 last_event_id: Optional[int] = Header(default=None, ge=0)):
+    job = get_task_status(uuid)
+    if JobState(job["status"]).finished:
+        raise HTTPException(status_code=410, detail=f"Scan is {job['status']}, its result is in {job['output_file']}.")
+    if last_event_id is not None:
+        offset = last_event_id + 1
+    results = scan.results_for(uuid)
+    return StreamingResponse(render(results, offset, format), media_type=MEDIA_TYPES[format])
+
+
+@app.delete("/scan/{uuid}")
+async def cancel(uuid: str, write_partial: bool = Query(default=False, alias="partial")):
+    """Cancel the scan `uuid`. Files waiting for a worker are dropped at once; files being scanned finish within
+    their deadline. With `partial` the results merged so far are written to the output file. Once the report is
+    written the scan can not be cancelled any more.
+    """
+    job = get_task_status(uuid)
+    task = next((task for task in tasks if task.get_name() == uuid), None)
+    if JobState(job["status"]) in (JobState.writing, JobState.done, JobState.failed, JobState.cancelled) or not task:
+        raise HTTPException(status_code=409, detail=f"Scan is {job['status']} and can not be cancelled.")
+    if write_partial:
+        scan.partial_results.add(uuid)
+    task.cancel()
+    return {"uuid": uuid, "status": "cancelling", "partial": write_partial}
+
+
+@app.get("/workers")
+async def workers():
+    """Return the worker processes of the pool with their unique set size in bytes."""
+    return {"jobs": scan.tasks_run, "recycle_tasks": scan.recycle_tasks, "recycle_uss": scan.recycle_uss,
+            "workers": [{"pid": pid, "uss": uss} for pid, uss in (await scan.refresh_worker_memory()).items()]}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    await scan.refresh_worker_memory()
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
 @app.post("/scan/")
 async def scan_file(scan_request: ScanRequest) -> Any:
     uuid = await execute(scan_request)
     scan_request_dict = scan_request.dict()
     scan_request_dict.update({"uuid": uuid})
     return scan_request_dict
+
+
+@app.post("/scan/batch")
+async def scan_batch(scan_requests: list[ScanRequest] = Body(min_length=1)) -> Any:
+    batch, uuids = await execute_batch(scan_requests)
+    return {"batch": batch, "uuids": uuids}
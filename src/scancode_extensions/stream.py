@@ -0,0 +1,86 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import json
+import logging
+from enum import Enum
+from typing import AsyncIterator, Optional
+
+from commoncode.resource import Codebase
+
+log = logging.getLogger("scanservice")
+
+
+class StreamFormat(str, Enum):
+    ndjson = "ndjson"
+    sse = "sse"
+
+
+MEDIA_TYPES = {StreamFormat.ndjson: "application/x-ndjson", StreamFormat.sse: "text/event-stream"}
+
+
+class ResultLog:
+    """The paths of the resources of a running scan in the order their results were merged, so each result can be
+    streamed as soon as it is merged. The position of a resource in the log is its offset, from which a consumer
+    may resume. Only the paths are kept, the entries are read from the codebase when they are streamed.
+
+    Paths are added by the `MergeThread`; consumers follow the log in the event loop.
+    """
+
+    def __init__(self):
+        self.paths: list[str] = []
+        self.codebase: Optional[Codebase] = None
+        self.finished = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed = asyncio.Event()
+
+    def add(self, codebase: Codebase, paths: list[str]) -> None:
+        """Append the `paths` of merged resources of `codebase`. Called by the merge thread."""
+        self.codebase = codebase
+        self.paths.extend(paths)
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._notify)
+
+    def finish(self) -> None:
+        self.finished = True
+        self._notify()
+
+    def _notify(self) -> None:
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def follow(self, offset: int = 0) -> AsyncIterator[tuple[int, dict]]:
+        """Yield the offset and entry of each merged resource starting at `offset`, until the scan is finished."""
+        self._loop = asyncio.get_running_loop()
+        while True:
+            changed = self._changed
+            while offset < len(self.paths):
+                resource = self.codebase.get_resource(self.paths[offset])
+                yield offset, resource.to_dict(with_info=True)
+                offset += 1
+            if self.finished:
+                return
+            await changed.wait()
+
+
+async def render(results: ResultLog, offset: int, stream_format: StreamFormat) -> AsyncIterator[str]:
+    """Render the entries of `results` as JSON lines or as server-sent events with the offset as event id."""
+    async for index, entry in results.follow(offset):
+        if stream_format == StreamFormat.sse:
+            yield f"id: {index}\nevent: resource\ndata: {json.dumps(entry, separators=(',', ':'))}\n\n"
+        else:
+            yield json.dumps(entry, separators=(",", ":")) + "\n"
+    if stream_format == StreamFormat.sse:
+        yield "event: end\ndata: {}\n\n"
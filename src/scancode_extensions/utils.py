@@ -80,8 +80,7 @@ def make_atomic(like_process_codebase, modifier=uuid.uuid4):
     def wrapper(*args, **kwargs):
         if "output_json_pp" in kwargs:
             dst = kwargs.pop("output_json_pp")
-            copy_id = modifier()
-            tmp_dst = "%s.%s.tmp" % (dst, copy_id)
+            tmp_dst = temporary_path(dst, modifier)
             result = like_process_codebase(*args, output_json_pp=tmp_dst, **kwargs)
             os.rename(tmp_dst, dst)
             return result
@@ -90,6 +89,11 @@ def make_atomic(like_process_codebase, modifier=uuid.uuid4):
     return wrapper
 
 
+def temporary_path(dst, modifier=uuid.uuid4):
+    """Return the path of a temporary file in the folder of `dst`, which can be renamed atomically to `dst`."""
+    return "%s.%s.tmp" % (dst, modifier())
+
+
 def get_system_environment():
     return {
         'operating_system': commoncode.system.current_os,
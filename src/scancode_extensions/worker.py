@@ -0,0 +1,171 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+import tempfile
+import time
+import traceback
+from typing import Callable, Collection, Optional
+
+
+MIB = 1024 * 1024
+
+# Classes of files which may be routed to the lightweight scanners only, see `classify`.
+FILE_CLASSES = ("empty", "media", "archive", "binary")
+LIGHTWEIGHT_SCANNERS = ("get_file_info",)
+
+
+WARM_UP_SAMPLE = """/*
+ * Copyright (c) 2024 Example Corporation. All rights reserved.
+ * SPDX-License-Identifier: Apache-2.0
+ *
+ * Licensed under the Apache License, Version 2.0. See LICENSE file in the project root.
+ */
+int main(void) { return 0; }
+"""
+
+
+def initialize_worker(scanners: list[Callable] = ()) -> None:
+    """Load the license index and run all `scanners` once on a small sample, so the first file scanned by a worker
+    is not slower than any other. Scanners load data like file type magic or copyright grammars on first use.
+
+    A worker forked from a parent which ran this already shares all of it copy-on-write and does not load it again.
+    """
+    from licensedcode.cache import get_index
+
+    get_index()
+    handle, location = tempfile.mkstemp(suffix=".c")
+    try:
+        with os.fdopen(handle, "w") as sample:
+            sample.write(WARM_UP_SAMPLE)
+        scan_resource(location, scanners, delta_t=60)
+    finally:
+        os.remove(location)
+
+
+def worker_ready(delay: float = 0.01) -> int:
+    """Return the process id of the worker. The delay gives other workers the chance to take the next job."""
+    time.sleep(delay)
+    return os.getpid()
+
+
+def scan_resource(location: str, scanners: list[Callable], delta_t: int, delta_t_per_mib: float = 0,
+                  lightweight: Collection[str] = ()) -> dict:
+    """Run all `scanners` on the file at `location` and return their merged results. This is a single job for
+    the process pool, so a file costs one round trip to a worker no matter how many scanners are used.
+
+    Each scanner gets its own deadline, starting when the scanner starts. The time budget is `delta_t` seconds
+    plus `delta_t_per_mib` seconds for each MiB of the file. An exception raised by one scanner does not affect the
+    others; it is recorded in 'scan_errors' the same way ScanCode Toolkit does.
+
+    A file of one of the `lightweight` classes, see `classify`, is scanned by the lightweight scanners only, as
+    the license and copyright scanners would search the strings of a binary for nothing.
+    """
+    result, _ = timed_scan_resource(location, scanners, delta_t, delta_t_per_mib, lightweight)
+    return result
+
+
+def timed_scan_resource(location: str, scanners: list[Callable], delta_t: int, delta_t_per_mib: float = 0,
+                        lightweight: Collection[str] = ()) -> tuple[dict, list[tuple]]:
+    """Like `scan_resource`, but additionally return the name, the execution time and whether the deadline was
+    exceeded for each scanner which ran.
+    """
+    result = {}
+    scan_errors = []
+    measurements = []
+    budget = time_budget(location, delta_t, delta_t_per_mib)
+    if lightweight and any(scanner_name(scanner) not in LIGHTWEIGHT_SCANNERS for scanner in scanners):
+        if classify(location) in lightweight:
+            scanners = [scanner for scanner in scanners if scanner_name(scanner) in LIGHTWEIGHT_SCANNERS]
+    for scanner in scanners:
+        start = time.time()
+        deadline = start + budget
+        try:
+            result.update(scanner(location, deadline=deadline))
+        except Exception:
+            scan_errors.append(f"ERROR: for scanner: {scanner_name(scanner)}:\n{traceback.format_exc()}")
+        end = time.time()
+        measurements.append((scanner_name(scanner), end - start, end > deadline))
+    if scan_errors:
+        result["scan_errors"] = scan_errors
+    return result, measurements
+
+
+def timed_scan_resources(locations: list[str], scanners: list[Callable], delta_t: int, delta_t_per_mib: float = 0,
+                         lightweight: Collection[str] = ()) -> list[tuple[dict, list[tuple]]]:
+    """Scan a batch of files with `timed_scan_resource` in a single job for the process pool. Batching small files
+    saves the round trip to a worker per file, which otherwise costs as much as scanning the file.
+    """
+    return [timed_scan_resource(location, scanners, delta_t, delta_t_per_mib, lightweight) for location in locations]
+
+
+def classify(location: str) -> Optional[str]:
+    """Return the class of the file at `location`: 'empty', 'media' for images, audio and video, 'archive' for
+    archives and compressed files, 'binary' for any other binary, or None for text and PDF files. The file type is
+    detected like `get_file_info` does, which reuses the detected type of the same location.
+    """
+    from typecode.contenttype import get_type
+
+    try:
+        if os.path.getsize(location) == 0:
+            return "empty"
+    except OSError:
+        return None
+    collector = get_type(location)
+    if collector.is_text or collector.is_pdf:
+        return None
+    if collector.is_media:
+        return "media"
+    if collector.is_archive or collector.is_compressed:
+        return "archive"
+    if collector.is_binary:
+        return "binary"
+    return None
+
+
+def time_budget(location: str, delta_t: int, delta_t_per_mib: float = 0) -> float:
+    """Return the seconds a scanner may spend on the file at `location`."""
+    if not delta_t_per_mib:
+        return int(delta_t)
+    try:
+        size = os.path.getsize(location)
+    except OSError:
+        size = 0
+    return int(delta_t) + delta_t_per_mib * size / MIB
+
+
+def scanner_name(scanner: Callable) -> str:
+    return getattr(scanner, "__name__", type(scanner).__name__)
+
+
+def find_license_references(detections: list[tuple[str, list[dict]]]) -> list[str]:
+    """Return the paths of all resources in `detections` with license detections referencing other files, like
+    'see LICENSE', which are not resolved yet. Only these need the whole codebase for post-processing.
+    """
+    from licensedcode.detection import LicenseDetectionFromResult
+    from licensedcode.detection import get_referenced_filenames
+    from licensedcode.detection import has_resolved_referenced_file
+
+    referencing = []
+    for path, license_detection_mappings in detections:
+        for license_detection_mapping in license_detection_mappings:
+            license_detection = LicenseDetectionFromResult.from_license_detection_mapping(
+                license_detection_mapping=license_detection_mapping,
+                file_path=path,
+            )
+            if (get_referenced_filenames(license_detection.matches)
+                    and not has_resolved_referenced_file(license_detection.matches)):
+                referencing.append(path)
+                break
+    return referencing
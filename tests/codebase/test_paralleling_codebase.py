@@ -12,6 +12,8 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import asyncio
+
 import pytest
 import pytest_asyncio
 
@@ -63,6 +65,36 @@ async def test_allow_async_merge(thread: MergeThread, sample_codebase: Codebase)
     assert "license_detections" in second_dict
 
 
+@pytest.mark.asyncio
+async def test_concurrent_writes_are_merged_in_batches(sample_codebase: Codebase):
+    paths = [r.path for r in sample_codebase.walk() if r.is_file]
+    async with MergeThread(sample_codebase) as thread:
+        await asyncio.gather(*[thread.write(path, {"copyrights": [{"copyright": path}]}) for path in paths * 10])
+        assert thread.queue_depth == 0
+
+    assert thread.merged == len(paths) * 10
+    assert thread.batches < thread.merged
+    assert thread.merge_rate > 0
+
+
+@pytest.mark.asyncio
+async def test_results_for_same_resource_are_coalesced(sample_codebase: Codebase):
+    resource_path = "samples/JGroups/LICENSE"
+    async with MergeThread(sample_codebase) as thread:
+        await asyncio.gather(thread.write(resource_path, {"license_detections": [{"license_expression": "mit"}]}),
+                             thread.write(resource_path, {"copyrights": [{"copyright": "(c) Any"}]}))
+
+    out = sample_codebase.get_resource(resource_path).to_dict()
+    assert out["license_detections"] and out["copyrights"]
+
+
+@pytest.mark.asyncio
+async def test_failed_merge_is_raised_to_writer(sample_codebase: Codebase):
+    async with MergeThread(sample_codebase) as thread:
+        with pytest.raises(AttributeError):
+            await thread.write("xxx/this/path/is/not/existing", {"copyrights": [{"copyright": "(c) Any"}]})
+
+
 @pytest_asyncio.fixture()
 async def thread(sample_codebase: Codebase):
     thread = MergeThread(sample_codebase)
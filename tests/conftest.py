@@ -69,6 +69,18 @@ def fifty_folders_each_contains_single_file(faker, add_providers, tmp_path):
     return tmp_path
 
 
+@pytest.fixture
+def referencing_project(tmp_path, build_cache):
+    """A project with a file referencing the license in another file."""
+    project = tmp_path / "project"
+    (project / "src").mkdir(parents=True)
+    (project / "LICENSE").write_text("Licensed under the Apache License, Version 2.0 (the \"License\");\n"
+                                     "you may not use this file except in compliance with the License.\n")
+    (project / "src" / "main.c").write_text("/* See LICENSE file for license terms. */\n")
+    (project / "src" / "other.c").write_text("/* Licensed under the MIT license. */\n")
+    return project
+
+
 @pytest.fixture
 def sample_codebase(samples_folder):
     codebase = Codebase(samples_folder, resource_attributes=resource.resource_attributes(),
@@ -88,3 +100,24 @@ def toolkit_base(request: FixtureRequest):
     if not os.path.exists(toolkit_base):
         raise FileNotFoundError("ScanCode Toolkit is not a sibling of project directory.")
     return toolkit_base
+
+
+class JobCountingScan(AsynchronousScan):
+    """Records the locations of each job submitted to the process pool."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.submitted: list[list[str]] = []
+
+    @property
+    def scanned(self) -> list[str]:
+        return [location for job in self.submitted for location in job]
+
+    async def scan_in_pool(self, locations, *args, **kwargs):
+        self.submitted.append(list(locations))
+        return await super().scan_in_pool(locations, *args, **kwargs)
+
+
+@pytest.fixture
+def job_counting_scan():
+    return JobCountingScan
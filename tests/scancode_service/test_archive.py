@@ -0,0 +1,97 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from scancode_extensions import archive
+from scancode_extensions.archive import ArchiveMembers, member_path
+
+CONTENT = {"src/a.c": b"int main() {}\n", "src/lib/b.py": b"print('b')\n", "README": b"x" * 4096}
+
+
+def write_tar(path):
+    with tarfile.open(path, "w:gz") as f:
+        for name, content in CONTENT.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            f.addfile(info, io.BytesIO(content))
+        f.addfile(tarfile.TarInfo("../escape"), io.BytesIO(b""))
+    return path
+
+
+def write_zip(path):
+    with zipfile.ZipFile(path, "w") as f:
+        f.writestr("src/", b"")
+        for name, content in CONTENT.items():
+            f.writestr(name, content)
+    return path
+
+
+@pytest.fixture(params=["tar", "zip"])
+def sample_archive(request, tmp_path):
+    if request.param == "tar":
+        return write_tar(tmp_path / "sample.tar.gz")
+    return write_zip(tmp_path / "sample.zip")
+
+
+@pytest.fixture
+def memory_directory(tmp_path, monkeypatch):
+    directory = tmp_path / "shm"
+    directory.mkdir()
+    monkeypatch.setattr(archive, "MEMORY_DIRECTORY", str(directory))
+    return directory
+
+
+def test_member_path_rejects_paths_outside_archive():
+    assert member_path("./src//a.c") == "src/a.c"
+    assert member_path("/etc/passwd") == "etc/passwd"
+    assert member_path("../escape") is None
+    assert member_path("src/../../escape") is None
+
+
+def test_list_regular_files(sample_archive):
+    members = ArchiveMembers(sample_archive)
+
+    assert sorted(members.list()) == sorted((name, len(content)) for name, content in CONTENT.items())
+    assert archive.is_archive(sample_archive)
+
+
+def test_members_are_extracted_one_by_one(sample_archive, memory_directory, tmp_path):
+    members = ArchiveMembers(sample_archive, memory_limit=1024, temp_dir=str(tmp_path / "temp"))
+    os.mkdir(tmp_path / "temp")
+
+    for path, location in members:
+        with open(location, "rb") as f:
+            assert f.read() == CONTENT[path]
+        assert os.path.basename(location) == os.path.basename(path)
+        in_memory = location.startswith(str(memory_directory))
+        assert in_memory == (len(CONTENT[path]) <= 1024)
+        ArchiveMembers.release(location)
+        assert not os.path.exists(location)
+    members.close()
+
+    assert not os.listdir(memory_directory)
+    assert not os.listdir(tmp_path / "temp")
+
+
+def test_is_archive_rejects_other_files(tmp_path):
+    (tmp_path / "plain.txt").write_text("plain")
+
+    assert not archive.is_archive(tmp_path / "plain.txt")
+    assert not archive.is_archive(tmp_path)
@@ -14,6 +14,9 @@
 
 from pathlib import Path
 
+import pytest
+
+from scancode_extensions.resource import create_codebase
 from scancode_extensions.service import Scan
 from scancode_extensions.utils import compute_scanroot_relative
 
@@ -42,3 +45,27 @@ def test_init_scan():
 
     assert out.base == Path("/any/path")
     assert out.output_file == Path("/another/path/result.json")
+
+
+@pytest.mark.asyncio
+async def test_events_are_created_from_codebase(fifty_folders_each_contains_single_file):
+    base = fifty_folders_each_contains_single_file
+    codebase = create_codebase(base)
+
+    events = [event async for event in Scan(base, "/dev/null").create_events(codebase)]
+
+    assert len(events) == 50
+    for event in events:
+        assert event.relative_path == compute_scanroot_relative(event.location, base)
+
+
+@pytest.mark.asyncio
+async def test_single_file_creates_single_event(tmp_path):
+    single_file = Path(tmp_path, "LICENSE")
+    single_file.write_text("Apache-2.0")
+    codebase = create_codebase(single_file)
+
+    events = [event async for event in Scan(single_file, "/dev/null").create_events(codebase)]
+
+    assert [event.location for event in events] == [str(single_file)]
+    assert [event.relative_path for event in events] == ["LICENSE"]
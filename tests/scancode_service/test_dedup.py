@@ -0,0 +1,83 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+
+import pytest
+from scancode.api import get_file_info
+
+from scancode_extensions.dedup import Deduplicator, content_digest
+from scancode_extensions.service import Scan
+
+
+def test_duplicates_wait_for_result_of_primary():
+    dedup = Deduplicator()
+
+    assert dedup.add("a", "1") == (True, None)
+    assert dedup.add("b", "1", "duplicate b") == (False, None)
+    assert dedup.add("c", "2") == (True, None)
+    assert dedup.add("d", None) == (True, None)
+    assert dedup.resolve("a", {"size": 1}) == ["duplicate b"]
+    assert dedup.add("e", "1", "duplicate e") == (False, ("a", {"size": 1}))
+    assert dedup.resolve("d", {}) == []
+
+
+def test_content_digest_of_missing_file_is_none(tmp_path):
+    (tmp_path / "a").write_text("a")
+
+    assert content_digest(str(tmp_path / "a")) == content_digest(str(tmp_path / "a"))
+    assert content_digest(str(tmp_path / "missing")) is None
+
+
+@pytest.mark.parametrize("deduplicate, scans", [(True, 2), (False, 5)])
+@pytest.mark.asyncio
+async def test_identical_files_are_scanned_once(tmp_path, job_counting_scan, deduplicate, scans):
+    project = tmp_path / "project"
+    for directory in ["a", "b", "c", "d"]:
+        (project / directory).mkdir(parents=True)
+        (project / directory / "LICENSE").write_text("Licensed under the MIT license.")
+    (project / "main.c").write_text("int main() {}")
+    counting_scan = job_counting_scan(scanners=[get_file_info], processes=1, deduplicate=deduplicate)
+
+    await counting_scan(Scan(project, tmp_path / "result.json"))
+    counting_scan.shutdown()
+
+    with open(tmp_path / "result.json") as f:
+        report = json.load(f)
+    files = {entry["path"]: entry for entry in report["files"] if entry["type"] == "file"}
+    assert len(counting_scan.scanned) == scans
+    assert len(files) == 5
+    assert len({files[f"project/{directory}/LICENSE"]["sha1"] for directory in ["a", "b", "c", "d"]}) == 1
+    assert all(entry["size"] for entry in files.values())
+    deduplication = report["headers"][0]["extra_data"]["deduplication"]
+    assert deduplication["duplicates"] == 5 - scans
+    assert deduplication["ratio"] == (5 - scans) / 5
+
+
+@pytest.mark.asyncio
+async def test_duplicates_get_info_derived_from_their_own_name(tmp_path, job_counting_scan):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "a.c").write_text("int main(void) { return 0; }\n")
+    (project / "b.txt").write_text("int main(void) { return 0; }\n")
+    counting_scan = job_counting_scan(scanners=[get_file_info], processes=1)
+
+    await counting_scan(Scan(project, tmp_path / "result.json"))
+    counting_scan.shutdown()
+
+    with open(tmp_path / "result.json") as f:
+        files = {entry["path"]: entry for entry in json.load(f)["files"] if entry["type"] == "file"}
+    assert len(counting_scan.scanned) == 1
+    assert files["project/a.c"]["programming_language"] == "C" and files["project/a.c"]["is_source"]
+    assert files["project/b.txt"]["programming_language"] is None and not files["project/b.txt"]["is_source"]
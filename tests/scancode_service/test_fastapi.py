@@ -12,15 +12,18 @@
 #  See the License for the specific language governing permissions and
 #  limitations under the License.
 
+import asyncio
 import dataclasses
 import os.path
 from pathlib import Path
 
 import pytest
+from fastapi import HTTPException
 from fastapi.testclient import TestClient
 
 import scancode_extensions
-from scancode_extensions.service import app, scan
+from scancode_extensions.jobs import JobState
+from scancode_extensions.service import app, jobs, scan
 
 client = TestClient(app)
 
@@ -59,6 +62,164 @@ def test_post_returns_json_with_uuid(replace_scan_singleton):
     assert "uuid" in response.json()
 
 
+def test_post_rejects_unknown_output_format(replace_scan_singleton, tmp_path):
+    workload = {"scan_path": str(tmp_path), "output_file": "result.json", "output_format": "xml"}
+
+    response = client.post("/scan/", json=workload)
+
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("priority", [0, 101])
+def test_post_rejects_priority_out_of_range(replace_scan_singleton, tmp_path, priority):
+    workload = {"scan_path": str(tmp_path), "output_file": "result.json", "priority": priority}
+
+    response = client.post("/scan/", json=workload)
+
+    assert response.status_code == 422
+
+
+def test_post_rejects_missing_previous_result(replace_scan_singleton, tmp_path):
+    workload = {"scan_path": str(tmp_path), "output_file": "result.json",
+                "previous_result": str(tmp_path / "missing.json")}
+
+    response = client.post("/scan/", json=workload)
+
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("scanners", [[], ["packages"]])
+def test_post_rejects_unknown_or_no_scanners(replace_scan_singleton, tmp_path, scanners):
+    workload = {"scan_path": str(tmp_path), "output_file": "result.json", "scanners": scanners}
+
+    response = client.post("/scan/", json=workload)
+
+    assert response.status_code == 422
+
+
+def test_post_rejects_archive_scan_of_directory(replace_scan_singleton, tmp_path):
+    workload = {"scan_path": str(tmp_path), "output_file": "result.json", "archive": True}
+
+    response = client.post("/scan/", json=workload)
+
+    assert response.status_code == 400
+
+
+def test_post_batch_returns_uuids_and_batch_status(replace_scan_singleton, tmp_path):
+    workload = [{"scan_path": str(tmp_path), "output_file": f"result-{index}.json"} for index in range(3)]
+
+    response = client.post("/scan/batch", json=workload)
+
+    assert response.status_code == 200
+    uuids = response.json()["uuids"]
+    assert len(uuids) == 3
+    response = client.get(f"/scan/batch/{response.json()['batch']}")
+    assert response.status_code == 200
+    assert [job["uuid"] for job in response.json()["scans"]] == uuids
+    assert sum(response.json()["states"].values()) == 3
+
+
+def test_post_batch_is_rejected_as_a_whole(replace_scan_singleton, tmp_path):
+    workload = [{"scan_path": str(tmp_path), "output_file": "result.json"},
+                {"scan_path": str(tmp_path / "missing"), "output_file": "result.json"}]
+
+    response = client.post("/scan/batch", json=workload)
+
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Scan request 1:")
+
+
+def test_stream_of_finished_scan_is_gone():
+    jobs.create("FINISHED_SCAN", "/any/path", "result.json")
+    jobs.update("FINISHED_SCAN", JobState.done)
+
+    assert client.get("/scan/FINISHED_SCAN/stream").status_code == 410
+    assert client.get("/scan/UNKNOWN_SCAN/stream").status_code == 404
+
+
+def test_finished_scan_can_not_be_cancelled():
+    jobs.create("DONE_SCAN", "/any/path", "result.json")
+    jobs.update("DONE_SCAN", JobState.done)
+
+    assert client.delete("/scan/DONE_SCAN").status_code == 409
+    assert client.delete("/scan/UNKNOWN_SCAN").status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_scan_writing_its_report_can_not_be_cancelled():
+    jobs.create("WRITING_SCAN", "/any/path", "result.json")
+    jobs.update("WRITING_SCAN", JobState.writing)
+    await scancode_extensions.service.schedule_task(asyncio.sleep(10), "WRITING_SCAN")
+    task = next(task for task in scancode_extensions.service.tasks if task.get_name() == "WRITING_SCAN")
+
+    with pytest.raises(HTTPException) as error:
+        await scancode_extensions.service.cancel("WRITING_SCAN")
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert error.value.status_code == 409
+
+
+@pytest.mark.asyncio
+async def test_queued_scan_is_cancelled():
+    jobs.create("QUEUED_SCAN", "/any/path", "result.json")
+    await scancode_extensions.service.schedule_task(asyncio.sleep(10), "QUEUED_SCAN")
+    task = next(task for task in scancode_extensions.service.tasks if task.get_name() == "QUEUED_SCAN")
+
+    response = await scancode_extensions.service.cancel("QUEUED_SCAN", write_partial=True)
+    await asyncio.gather(task, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert response == {"uuid": "QUEUED_SCAN", "status": "cancelling", "partial": True}
+    assert jobs.get("QUEUED_SCAN")["status"] == JobState.cancelled
+    assert "QUEUED_SCAN" not in scan.partial_results
+
+
+def test_get_unknown_batch_is_not_found():
+    assert client.get("/scan/batch/unknown").status_code == 404
+
+
+def test_post_rejects_unavailable_compression(replace_scan_singleton, tmp_path, monkeypatch):
+    monkeypatch.setattr(scancode_extensions.output, "is_available", lambda compression: False)
+    workload = {"scan_path": str(tmp_path), "output_file": "result.json.zst", "compression": "zstd"}
+
+    response = client.post("/scan/", json=workload)
+
+    assert response.status_code == 400
+
+
+def test_progress_of_queued_scan_reports_time_in_stage():
+    jobs.create("ID_PROGRESS", "/any/path", "result.json")
+
+    response = client.get("/scan/ID_PROGRESS/progress")
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "queued"
+    assert response.json()["stages"]["queued"] >= 0
+
+
+def test_progress_of_unknown_scan_is_not_found():
+    response = client.get("/scan/unknown/progress")
+
+    assert response.status_code == 404
+
+
+def test_metrics_are_exposed_in_prometheus_format():
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE scanservice_scanner_seconds histogram" in response.text
+    assert "scanservice_scans_in_flight 0.0" in response.text
+
+
+def test_workers_are_listed_with_memory():
+    response = client.get("/workers")
+
+    assert response.status_code == 200
+    assert set(response.json()) == {"jobs", "recycle_tasks", "recycle_uss", "workers"}
+
+
 @pytest.mark.parametrize("paths", ["/home/kai/projekte/metaeffekt/scancode-toolkit/samples/", ])
 @pytest.mark.skip("Long running test.")
 def test_multi_post(tmp_path, paths, faker):
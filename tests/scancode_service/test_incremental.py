@@ -0,0 +1,97 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import json
+
+import pytest
+from scancode.api import get_file_info
+
+from scancode_extensions.incremental import PreviousResult, read_report
+from scancode_extensions.output import Compression, OutputFormat
+from scancode_extensions.service import Scan
+
+
+def no_scan(location, deadline):
+    return {}
+
+
+@pytest.fixture
+def project(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        (project / name).write_text(f"Content of {name}")
+    return project
+
+
+@pytest.fixture
+def scan_project(job_counting_scan):
+    async def scan(project, output_file, previous_result=None, scanners=(get_file_info,), **kwargs):
+        counting_scan = job_counting_scan(scanners=list(scanners), processes=1)
+        await counting_scan(Scan(project, output_file, previous_result=previous_result, **kwargs))
+        counting_scan.shutdown()
+        _, files = read_report(output_file)
+        return counting_scan.scanned, {entry["path"]: entry for entry in files}
+
+    return scan
+
+
+@pytest.mark.asyncio
+async def test_only_changed_files_are_scanned_again(project, tmp_path, scan_project):
+    _, previous = await scan_project(project, tmp_path / "previous.json")
+    (project / "b.txt").write_text("Changed content of b.txt")
+
+    scanned, files = await scan_project(project, tmp_path / "result.json", previous_result=tmp_path / "previous.json")
+
+    assert scanned == [str(project / "b.txt")]
+    assert files["project/a.txt"]["sha1"] == previous["project/a.txt"]["sha1"]
+    assert files["project/b.txt"]["sha1"] != previous["project/b.txt"]["sha1"]
+    assert files["project/b.txt"]["size"] == len("Changed content of b.txt")
+
+
+@pytest.mark.asyncio
+async def test_all_files_are_scanned_if_scanners_differ(project, tmp_path, scan_project):
+    await scan_project(project, tmp_path / "previous.json")
+
+    scanned, _ = await scan_project(project, tmp_path / "result.json", previous_result=tmp_path / "previous.json",
+                                    scanners=(get_file_info, no_scan))
+
+    assert len(scanned) == 3
+
+
+@pytest.mark.asyncio
+async def test_previous_result_may_be_compressed_json_lines(project, tmp_path, scan_project):
+    await scan_project(project, tmp_path / "previous.jsonl.gz", output_format=OutputFormat.json_lines,
+                       compression=Compression.gzip)
+
+    scanned, files = await scan_project(project, tmp_path / "result.json",
+                                        previous_result=tmp_path / "previous.jsonl.gz")
+
+    assert scanned == []
+    assert len(files) == 4
+
+
+def test_files_with_errors_or_exceeded_deadline_are_not_reused(tmp_path):
+    report = {
+        "headers": [{"options": {"scanners": "scanners"},
+                     "extra_data": {"deadline_exceeded": [{"path": "project/slow.txt", "scanners": ["any"]}]}}],
+        "files": [{"path": "project/slow.txt", "type": "file", "sha1": "1"},
+                  {"path": "project/error.txt", "type": "file", "sha1": "2", "scan_errors": ["ERROR"]},
+                  {"path": "project/ok.txt", "type": "file", "sha1": "3"}],
+    }
+    (tmp_path / "previous.json").write_text(json.dumps(report))
+
+    previous = PreviousResult.load(tmp_path / "previous.json", "scanners", ["sha1"])
+
+    assert list(previous.entries) == ["project/ok.txt"]
@@ -0,0 +1,91 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import time
+
+from scancode_extensions.jobs import JobRegistry, JobState
+
+
+def test_created_job_is_queued():
+    jobs = JobRegistry()
+
+    jobs.create("ID_01", "/any/path", "result.json")
+
+    job = jobs.get("ID_01")
+    assert job["status"] == "queued"
+    assert job["scan_path"] == "/any/path"
+    assert job["output_file"] == "result.json"
+
+
+def test_unknown_job_is_none():
+    assert JobRegistry().get("ID_01") is None
+
+
+def test_duration_of_each_stage_is_recorded():
+    jobs = JobRegistry()
+    jobs.create("ID_01", "/any/path", "result.json")
+
+    for state in [JobState.scanning, JobState.post_processing, JobState.writing, JobState.done]:
+        jobs.update("ID_01", state)
+
+    job = jobs.get("ID_01")
+    assert job["status"] == "done"
+    assert set(job["stages"]) == {"queued", "scanning", "post-processing", "writing"}
+
+
+def test_failed_job_has_error():
+    jobs = JobRegistry()
+    jobs.create("ID_01", "/any/path", "result.json")
+
+    jobs.update("ID_01", JobState.failed, "RuntimeError()")
+
+    assert jobs.get("ID_01")["error"] == "RuntimeError()"
+
+
+def test_finished_jobs_are_purged_after_retention():
+    jobs = JobRegistry(retention=0)
+    jobs.create("ID_01", "/any/path", "result.json")
+    jobs.create("ID_02", "/any/path", "result.json")
+    jobs.update("ID_01", JobState.done)
+    time.sleep(0.01)
+
+    jobs.purge()
+
+    assert jobs.get("ID_01") is None
+    assert jobs.get("ID_02") is not None
+
+
+def test_unfinished_jobs_fail_after_restart(tmp_path):
+    jobs = JobRegistry(tmp_path / "jobs.sqlite")
+    jobs.create("ID_01", "/any/path", "result.json")
+    jobs.create("ID_02", "/any/path", "result.json")
+    jobs.update("ID_01", JobState.done)
+
+    restarted = JobRegistry(tmp_path / "jobs.sqlite")
+
+    assert restarted.get("ID_01")["status"] == "done"
+    assert restarted.get("ID_02")["status"] == "failed"
+
+
+def test_scans_of_batch_are_queried_at_once():
+    jobs = JobRegistry()
+    jobs.create_batch("BATCH_01", [("ID_01", "/any/path", "a.json"), ("ID_02", "/other/path", "b.json")])
+    jobs.create("ID_03", "/any/path", "c.json")
+
+    scans = jobs.get_batch("BATCH_01")
+
+    assert [job["uuid"] for job in scans] == ["ID_01", "ID_02"]
+    assert {job["batch"] for job in scans} == {"BATCH_01"}
+    assert jobs.get("ID_03")["batch"] is None
+    assert jobs.get_batch("BATCH_02") == []
@@ -0,0 +1,70 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import pytest
+
+from scancode_extensions import metrics
+from scancode_extensions.metrics import Counter, Gauge, Histogram
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    monkeypatch.setattr(metrics, "registry", [])
+
+
+def test_counter_is_rendered_with_labels():
+    counter = Counter("test_hits", "Hits.", labels=("scanner",))
+
+    counter.inc(scanner="get_licenses")
+    counter.inc(2, scanner="get_licenses")
+
+    assert 'test_hits_total{scanner="get_licenses"} 3.0' in metrics.render()
+    assert "# HELP test_hits_total Hits." in metrics.render()
+    assert "# TYPE test_hits_total counter" in metrics.render()
+
+
+def test_gauge_without_labels_is_rendered_from_start():
+    Gauge("test_in_flight", "In flight.")
+
+    assert "test_in_flight 0.0" in metrics.render()
+
+
+def test_gauge_with_labels_is_read_from_function():
+    gauge = Gauge("test_rss_bytes", "RSS.", labels=("pid",))
+
+    gauge.set_function(lambda: {(42,): 1024, (43,): 2048})
+
+    assert 'test_rss_bytes{pid="42"} 1024\n' in metrics.render()
+    assert 'test_rss_bytes{pid="43"} 2048' in metrics.render()
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Seconds.", buckets=(0.1, 1.0))
+
+    for value in [0.05, 0.1, 0.5, 2.0]:
+        histogram.observe(value)
+
+    rendered = metrics.render()
+    assert 'test_seconds_bucket{le="0.1"} 2\n' in rendered
+    assert 'test_seconds_bucket{le="1.0"} 3\n' in rendered
+    assert 'test_seconds_bucket{le="+Inf"} 4\n' in rendered
+    assert "test_seconds_count 4\n" in rendered
+    assert "test_seconds_sum 2.65" in rendered
+
+
+def test_unknown_labels_are_rejected():
+    counter = Counter("test_hits", "Hits.", labels=("scanner",))
+
+    with pytest.raises(ValueError):
+        counter.inc(worker="1")
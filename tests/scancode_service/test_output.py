@@ -0,0 +1,124 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import gzip
+import json
+import os
+
+import pytest
+from formattedcode.output_json import JsonPrettyOutput
+from scancode.api import get_licenses
+
+from scancode_extensions import postprocessing
+from scancode_extensions.output import Compression, OutputFormat, StreamingJsonWriter, create_writer, is_available
+from scancode_extensions.resource import create_codebase
+
+
+def scan_while_writing(location, writer):
+    codebase = create_codebase(location)
+    for resource in codebase.walk():
+        if resource.is_file:
+            for k, v in get_licenses(resource.location).items():
+                setattr(resource, k, v)
+            codebase.save_resource(resource)
+            writer.add(resource)
+    postprocessing.add_license_detections(codebase)
+    return codebase
+
+
+def test_report_equals_json_pretty_output(referencing_project, tmp_path):
+    output_file = tmp_path / "streamed.json"
+    writer = StreamingJsonWriter(output_file)
+    codebase = scan_while_writing(referencing_project, writer)
+    writer.close(codebase)
+
+    expected_file = tmp_path / "expected.json"
+    JsonPrettyOutput().process_codebase(codebase, output_json_pp=str(expected_file), info=True)
+
+    with open(output_file) as f:
+        streamed = json.load(f)
+    with open(expected_file) as f:
+        expected = json.load(f)
+    assert sorted(streamed["files"], key=lambda e: e["path"]) == expected["files"]
+    assert streamed["license_detections"] == expected["license_detections"]
+    assert streamed["headers"] == expected["headers"]
+
+
+def test_referencing_resources_are_deferred(referencing_project, tmp_path):
+    writer = StreamingJsonWriter(tmp_path / "streamed.json")
+    codebase = scan_while_writing(referencing_project, writer)
+
+    assert writer.deferred == {"project/src/main.c"}
+    writer.close(codebase)
+
+
+def test_report_appears_on_close_only(referencing_project, tmp_path):
+    output_file = tmp_path / "streamed.json"
+    writer = StreamingJsonWriter(output_file)
+    codebase = scan_while_writing(referencing_project, writer)
+
+    assert not output_file.exists()
+    writer.close(codebase)
+    assert output_file.exists()
+    assert not os.path.exists(writer.tmp_file)
+
+
+def test_abort_removes_temporary_file(tmp_path):
+    writer = StreamingJsonWriter(tmp_path / "streamed.json")
+
+    writer.abort()
+
+    assert not os.listdir(tmp_path)
+
+
+def read_report(output_file, opener=open):
+    with opener(output_file, "rt") as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("output_format", list(OutputFormat))
+@pytest.mark.parametrize("compression,opener", [(Compression.none, open), (Compression.gzip, gzip.open)])
+def test_all_formats_contain_all_resources(referencing_project, tmp_path, output_format, compression, opener):
+    output_file = tmp_path / "report"
+    writer = create_writer(output_file, output_format, compression)
+    codebase = scan_while_writing(referencing_project, writer)
+    writer.close(codebase)
+
+    content = read_report(output_file, opener)
+    if output_format == OutputFormat.json_lines:
+        lines = [json.loads(line) for line in content.splitlines()]
+        files = [entry for line in lines if "files" in line for entry in line["files"]]
+        assert any("headers" in line for line in lines)
+    else:
+        files = json.loads(content)["files"]
+    assert sorted(f["path"] for f in files) == sorted(r.path for r in codebase.walk())
+
+
+def test_compact_json_has_no_indentation(referencing_project, tmp_path):
+    output_file = tmp_path / "report.json"
+    writer = create_writer(output_file, OutputFormat.json)
+    writer.close(scan_while_writing(referencing_project, writer))
+
+    assert "\n  " not in read_report(output_file)
+
+
+@pytest.mark.skipif(not is_available(Compression.zstd), reason="zstandard is not installed.")
+def test_zstd_compression(referencing_project, tmp_path):
+    import zstandard
+    output_file = tmp_path / "report.json.zst"
+    writer = create_writer(output_file, OutputFormat.json, Compression.zstd)
+    writer.close(scan_while_writing(referencing_project, writer))
+
+    with zstandard.open(output_file, "rt") as f:
+        assert json.load(f)["files"]
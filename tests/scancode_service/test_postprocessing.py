@@ -0,0 +1,55 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from licensedcode.plugin_license import LicenseScanner
+from scancode.api import get_licenses
+
+from scancode_extensions import postprocessing
+from scancode_extensions.resource import create_codebase
+
+OPTIONS = dict(license_text=True, license_diagnostics=True, license_text_diagnostics=True)
+
+
+def scanned_codebase(location):
+    codebase = create_codebase(location)
+    for resource in codebase.walk():
+        if resource.is_file:
+            for k, v in get_licenses(resource.location, include_text=True, license_diagnostics=True,
+                                     license_text_diagnostics=True).items():
+                setattr(resource, k, v)
+            codebase.save_resource(resource)
+    return codebase
+
+
+@pytest.mark.parametrize("executor", [None, ThreadPoolExecutor(2)])
+def test_equals_license_scanner(referencing_project, executor):
+    expected = scanned_codebase(referencing_project)
+    LicenseScanner().process_codebase(expected, **OPTIONS)
+
+    codebase = scanned_codebase(referencing_project)
+    postprocessing.add_license_detections(codebase, executor, chunk_size=1, **OPTIONS)
+
+    assert [r.to_dict() for r in codebase.walk()] == [r.to_dict() for r in expected.walk()]
+    assert codebase.attributes.license_detections == expected.attributes.license_detections
+
+
+def test_references_are_followed(referencing_project):
+    codebase = scanned_codebase(referencing_project)
+
+    postprocessing.add_license_detections(codebase, **OPTIONS)
+
+    assert codebase.get_resource("project/src/main.c").detected_license_expression == "apache-2.0"
@@ -0,0 +1,132 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import os
+
+import pytest
+
+from scancode_extensions.cache import ResultCache, fingerprint
+from scancode_extensions.dedup import content_digest
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return ResultCache(tmp_path / "cache", max_size=1024 * 1024)
+
+
+@pytest.fixture
+def license_file(tmp_path):
+    path = tmp_path / "LICENSE"
+    path.write_text("Licensed under the Apache License, Version 2.0")
+    return str(path)
+
+
+def test_miss_returns_key_without_result(cache, license_file):
+    key, result = cache.lookup(license_file, "namespace")
+
+    assert key
+    assert result is None
+
+
+def test_hit_returns_stored_result(cache, license_file):
+    key, _ = cache.lookup(license_file, "namespace")
+    cache.put(key, {"detected_license_expression": "apache-2.0"})
+
+    _, result = cache.lookup(license_file, "namespace")
+
+    assert result == {"detected_license_expression": "apache-2.0"}
+
+
+def test_same_content_at_different_location_is_a_hit(cache, license_file, tmp_path):
+    key, _ = cache.lookup(license_file, "namespace")
+    cache.put(key, {"detected_license_expression": "apache-2.0"})
+    copy = tmp_path / "vendor" / "LICENSE"
+    copy.parent.mkdir()
+    copy.write_text("Licensed under the Apache License, Version 2.0")
+
+    _, result = cache.lookup(str(copy), "namespace")
+
+    assert result == {"detected_license_expression": "apache-2.0"}
+
+
+def test_known_digest_gives_same_key(cache, license_file, tmp_path):
+    key, _ = cache.lookup(license_file, "namespace")
+
+    assert cache.key(license_file, "namespace", content_digest(license_file)) == key
+    assert cache.lookup(str(tmp_path / "missing"), "namespace") == (None, None)
+
+
+def test_other_namespace_is_a_miss(cache, license_file):
+    key, _ = cache.lookup(license_file, "namespace")
+    cache.put(key, {"detected_license_expression": "apache-2.0"})
+
+    _, result = cache.lookup(license_file, "other namespace")
+
+    assert result is None
+
+
+def test_path_dependent_info_is_not_taken_from_cache(cache, license_file):
+    key, _ = cache.lookup(license_file, "namespace")
+    cache.put(key, {"date": "1970-01-01", "size": 46})
+
+    _, result = cache.lookup(license_file, "namespace")
+
+    assert result["date"] != "1970-01-01"
+    assert result["size"] == 46
+
+
+def test_name_dependent_info_is_not_taken_from_cache(cache, tmp_path):
+    source = tmp_path / "a.c"
+    source.write_text("int main(void) { return 0; }\n")
+    text = tmp_path / "b.txt"
+    text.write_text(source.read_text())
+    key, _ = cache.lookup(str(text), "namespace")
+    cache.put(key, {"programming_language": None, "is_source": False, "is_script": False, "size": 29})
+
+    _, result = cache.lookup(str(source), "namespace")
+
+    assert result == {"programming_language": "C", "is_source": True, "is_script": False, "size": 29}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_size=1000)
+    keys = [f"{i:064x}" for i in range(10)]
+    for i, key in enumerate(keys):
+        cache.put(key, {"value": "x" * 100})
+        os.utime(cache._path(key), (i, i))
+
+    cache.put("f" * 64, {"value": "x" * 100})
+
+    assert cache.size <= 1000
+    assert cache.get(keys[0]) is None
+    assert cache.get("f" * 64) is not None
+
+
+def test_size_is_restored_from_disk(tmp_path):
+    cache = ResultCache(tmp_path / "cache", max_size=1000)
+    cache.put("a" * 64, {"value": "x" * 100})
+
+    assert ResultCache(tmp_path / "cache", max_size=1000).size == cache.size
+
+
+def test_fingerprint_depends_on_scanners_and_options():
+    def scanner():
+        pass
+
+    def another_scanner():
+        pass
+
+    assert fingerprint([scanner]) == fingerprint([scanner])
+    assert fingerprint([scanner]) != fingerprint([another_scanner])
+    assert fingerprint([scanner], "diagnostics") != fingerprint([scanner])
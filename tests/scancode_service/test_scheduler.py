@@ -0,0 +1,86 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+
+import pytest
+
+from scancode_extensions.scheduler import FairScheduler
+
+
+async def run_jobs(scheduler, jobs, order):
+    async def job(key, weight):
+        async with scheduler.slot(key, weight):
+            order.append(key)
+            await asyncio.sleep(0)
+
+    await asyncio.gather(*[job(key, weight) for key, weight in jobs])
+
+
+@pytest.mark.asyncio
+async def test_small_scan_is_not_queued_behind_large_scan():
+    scheduler = FairScheduler(slots=1)
+    order = []
+
+    large = asyncio.create_task(run_jobs(scheduler, [("large", 1)] * 20, order))
+    await asyncio.sleep(0)
+    await run_jobs(scheduler, [("small", 1)] * 2, order)
+    await large
+
+    assert order.index("small") <= 3
+    assert order[:7].count("small") == 2
+    assert len(order) == 22
+
+
+@pytest.mark.asyncio
+async def test_scans_share_slots_by_weight():
+    scheduler = FairScheduler(slots=1)
+    order = []
+
+    await run_jobs(scheduler, [("low", 1)] * 30 + [("high", 2)] * 30, order)
+
+    assert order[:30].count("high") == pytest.approx(20, abs=1)
+
+
+@pytest.mark.asyncio
+async def test_running_jobs_are_limited_by_slots():
+    scheduler = FairScheduler(slots=2)
+    running = []
+
+    async def job():
+        async with scheduler.slot("scan"):
+            running.append(scheduler.running)
+            await asyncio.sleep(0.001)
+
+    await asyncio.gather(*[job() for _ in range(10)])
+
+    assert max(running) == 2
+    assert scheduler.running == 0
+    assert scheduler.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiting_job_gives_up_its_place():
+    scheduler = FairScheduler(slots=1)
+    await scheduler.acquire("scan")
+    waiting = asyncio.create_task(scheduler.acquire("scan"))
+    await asyncio.sleep(0)
+
+    waiting.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    scheduler.release()
+
+    assert scheduler.running == 0
+    assert scheduler.waiting == 0
@@ -14,20 +14,29 @@
 
 import asyncio
 import dataclasses
+import json
 import logging
+import os
+import tarfile
+import threading
 import time
-from asyncio import BaseEventLoop
 
 import pytest
 import pytest_asyncio
+from fastapi import HTTPException
 from cluecode.plugin_copyright import CopyrightScanner
 from licensedcode.plugin_license import LicenseScanner
 from scancode.plugin_info import InfoScanner
 
+from scancode_extensions import archive
+from scancode_extensions import metrics
 from scancode_extensions import resource
 from scancode_extensions import service
+from scancode_extensions.cache import ResultCache
+from scancode_extensions.jobs import JobRegistry
+from scancode_extensions.progress import ScanProgress
 from scancode_extensions.resource import ScancodeCodebase as Codebase
-from scancode_extensions.service import AsynchronousScan, ScanRequest, Scan
+from scancode_extensions.service import AsynchronousScan, ScanRequest, Scan, Scanner, matches
 from scancode_extensions.utils import timings
 
 log = logging.getLogger("scancodeservice-test")
@@ -68,16 +77,16 @@ class ErroneousScan:
 
 
 @pytest.mark.asyncio
-async def test_erroneous_task_stops_execution(scan_with_error, samples_folder, codebase, event_loop: BaseEventLoop):
+async def test_erroneous_task_is_recorded_as_scan_error(scan_with_error, samples_folder, codebase):
     scan, erroneous_task = scan_with_error
     to_schedule = Scan(samples_folder, "/dev/null")
 
-    coro = scan.scan_files(to_schedule, codebase)
-    future = event_loop.create_task(coro)
-
     erroneous_task.throw_error()
-    with pytest.raises(RuntimeError):
-        await future
+    await scan.scan_files(to_schedule, codebase)
+
+    scan_errors = [r.scan_errors for r in codebase.walk() if r.is_file]
+    assert scan_errors
+    assert all("RuntimeError" in errors[0] for errors in scan_errors)
 
 @pytest_asyncio.fixture
 async def scan_with_error() -> (AsynchronousScan, ErroneousScan):
@@ -131,22 +140,389 @@ def test_build_codebase(samples_folder):
     assert codebase.compute_counts() == (33, 11, 0)
 
 
-async def fake_scan(self, *args, **kwargs):
-    await asyncio.sleep(5)
+class StagedScan(AsynchronousScan):
+    def __init__(self, *args, fail=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail = fail
+
+    async def run(self, single_scan):
+        assert self.jobs.get(single_scan.uuid)["status"] == "queued"
+        if self.fail:
+            raise RuntimeError("Scan failed.")
 
 
 @pytest.mark.asyncio
-@pytest.mark.skip("Tasks are deleted 30s after finishing. Should not be awaited.")
-async def test_read_status_of_scheduled_task():
+@pytest.mark.parametrize("fail, status", [(False, "done"), (True, "failed")])
+async def test_read_status_of_scheduled_task(monkeypatch, fail, status):
+    jobs = JobRegistry()
+    monkeypatch.setattr(service, "jobs", jobs)
     single_scan = Scan("/any/path", "any_output.json")
-    await service.schedule_scan(single_scan, default_scan=fake_scan)
+    jobs.create(single_scan.uuid, single_scan.base, single_scan.output_file)
 
-    assert service.get_task_status(single_scan.uuid) == dict(uuid=str(single_scan.uuid), status="pending")
+    await service.schedule_scan(single_scan, default_scan=StagedScan(processes=1, jobs=jobs, fail=fail))
+    await asyncio.gather(*service.tasks, return_exceptions=True)
 
-    await list(service.tasks)[0]
-
-    assert service.get_task_status(single_scan.uuid) == dict(uuid=str(single_scan.uuid), status="done")
-    await asyncio.sleep(5)
+    assert service.get_task_status(single_scan.uuid)["status"] == status
     assert len(service.tasks) == 0
-    with pytest.raises(KeyError):
-        service.get_task_status(single_scan.uuid)
+    with pytest.raises(HTTPException):
+        service.get_task_status("unknown")
+
+
+class CountingScan(AsynchronousScan):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.max_in_flight_seen = 0
+        self.scanned = []
+
+    async def scan_file(self, single_file, write, scanners=None):
+        self.in_flight += 1
+        self.max_in_flight_seen = max(self.max_in_flight_seen, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.scanned.append(single_file.relative_path)
+        self.in_flight -= 1
+
+
+@pytest.mark.asyncio
+async def test_scan_files_limits_files_in_flight(fifty_folders_each_contains_single_file):
+    base = fifty_folders_each_contains_single_file
+    codebase = Codebase(base, codebase_attributes=resource.codebase_attributes(),
+                        resource_attributes=resource.resource_attributes())
+    counting_scan = CountingScan(max_in_flight=5, queue_depth=2, batch_files=1)
+
+    await counting_scan.scan_files(Scan(base, "/dev/null"), codebase)
+
+    assert len(counting_scan.scanned) == 50
+    assert counting_scan.max_in_flight_seen == 5
+
+
+def file_size(location, deadline):
+    return {"size": os.path.getsize(location)}
+
+
+@pytest.mark.asyncio
+async def test_progress_counts_scanned_files_and_bytes(fifty_folders_each_contains_single_file):
+    base = fifty_folders_each_contains_single_file
+    codebase = resource.create_codebase(base)
+    single_scan = Scan(base, "/dev/null")
+    sizing_scan = AsynchronousScan(scanners=[file_size], processes=2)
+    progress = sizing_scan.progress[str(single_scan.uuid)] = ScanProgress(files_discovered=50)
+
+    await sizing_scan.scan_files(single_scan, codebase)
+    sizing_scan.shutdown()
+
+    assert progress.files_scanned == 50
+    assert progress.files_merged == 50
+    assert progress.bytes_scanned == sum(f.stat().st_size for f in base.rglob("*") if f.is_file())
+    assert progress.eta == 0
+    assert metrics.scanner_seconds.count(scanner="file_size") >= 50
+
+
+def sleepy(location, deadline):
+    time.sleep(0.01)
+    return {"size": os.path.getsize(location)}
+
+
+@pytest.mark.asyncio
+async def test_files_exceeding_deadline_are_listed_in_header_and_not_cached(tmp_path):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "project" / "slow.txt").write_text("slow")
+    cache = ResultCache(tmp_path / "cache", max_size=1024 * 1024)
+    sleepy_scan = AsynchronousScan(scanners=[sleepy], processes=1, delta_t=0, result_cache=cache)
+
+    await sleepy_scan(Scan(tmp_path / "project", tmp_path / "result.json"))
+    sleepy_scan.shutdown()
+
+    with open(tmp_path / "result.json") as f:
+        header = json.load(f)["headers"][0]
+    assert header["extra_data"]["deadline_exceeded"] == [dict(path="project/slow.txt", scanners=["sleepy"])]
+    assert cache.size == 0
+
+
+def crashing(location, deadline):
+    if os.path.basename(location).startswith("crash"):
+        os._exit(1)
+    return {"size": os.path.getsize(location)}
+
+
+@pytest.mark.asyncio
+async def test_files_crashing_the_worker_are_quarantined(tmp_path):
+    (tmp_path / "project").mkdir()
+    (tmp_path / "project" / "crash.txt").write_text("crash")
+    for i in range(5):
+        (tmp_path / "project" / f"file{i}.txt").write_text("fine" * i)
+    cache = ResultCache(tmp_path / "cache", max_size=1024 * 1024)
+    crashing_scan = AsynchronousScan(scanners=[crashing], processes=1, result_cache=cache, deduplicate=False,
+                                     batch_files=10)
+    restarts = metrics.pool_restarts.value()
+
+    await crashing_scan(Scan(tmp_path / "project", tmp_path / "result.json"))
+    (tmp_path / "project" / "crash.txt").unlink()
+    await crashing_scan(Scan(tmp_path / "project", tmp_path / "second.json"))
+    crashing_scan.shutdown()
+
+    with open(tmp_path / "result.json") as f:
+        result = json.load(f)
+    assert result["headers"][0]["extra_data"]["quarantined"] == ["project/crash.txt"]
+    files = {entry["path"]: entry for entry in result["files"] if entry["type"] == "file"}
+    assert files["project/crash.txt"]["scan_errors"]
+    assert all(not entry["scan_errors"] for path, entry in files.items() if path != "project/crash.txt")
+    assert metrics.pool_restarts.value() > restarts
+    with open(tmp_path / "second.json") as f:
+        second = json.load(f)
+    assert "quarantined" not in second["headers"][0]["extra_data"]
+    assert len([entry for entry in second["files"] if entry["type"] == "file"]) == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("recycling, reason, recycled", [(dict(recycle_tasks=5), "tasks", 4),
+                                                          (dict(recycle_uss=1), "memory", 1)])
+async def test_workers_are_recycled_without_losing_files(fifty_folders_each_contains_single_file, recycling, reason,
+                                                         recycled):
+    base = fifty_folders_each_contains_single_file
+    codebase = resource.create_codebase(base)
+    single_scan = Scan(base, "/dev/null")
+    recycling_scan = AsynchronousScan(scanners=[file_size], processes=2, batch_files=1, memory_check_interval=0,
+                                      **recycling)
+    progress = recycling_scan.progress[str(single_scan.uuid)] = ScanProgress(files_discovered=50)
+    recycles = metrics.pool_recycles.value(reason=reason)
+
+    await recycling_scan.scan_files(single_scan, codebase)
+    if recycling_scan.memory_check:
+        await recycling_scan.memory_check
+    await recycling_scan.warm_up()
+    recycling_scan.memory_checked = 0.0
+    worker_uss = await recycling_scan.refresh_worker_memory()
+    recycling_scan.shutdown()
+
+    assert progress.files_merged == 50
+    assert metrics.pool_recycles.value(reason=reason) - recycles >= recycled
+    assert len(worker_uss) == 2 and all(uss > 0 for uss in worker_uss.values())
+
+
+@pytest.mark.asyncio
+async def test_jobs_from_threads_are_scheduled_and_fall_back_to_thread(tmp_path):
+    pool_scan = AsynchronousScan(scanners=[file_size], processes=1)
+    loop = asyncio.get_running_loop()
+    executor = service.SchedulingExecutor(pool_scan, loop, "post-processing")
+
+    mapped = await loop.run_in_executor(None, lambda: list(executor.map(abs, [-1, -2, -3])))
+    pid = await loop.run_in_executor(None, lambda: executor.submit(os.getpid).result())
+    pool_scan.executor.shutdown()
+    fallback = await loop.run_in_executor(None, lambda: executor.submit(os.getpid).result())
+    pool_scan.shutdown()
+
+    assert mapped == [1, 2, 3]
+    assert pid != os.getpid()
+    assert fallback == os.getpid()
+    assert pool_scan.scheduler.running == 0
+
+
+@pytest.mark.asyncio
+async def test_worker_memory_is_checked_at_most_once_per_interval(fifty_folders_each_contains_single_file,
+                                                                  monkeypatch):
+    base = fifty_folders_each_contains_single_file
+    reads = []
+    monkeypatch.setattr(service, "process_uss", lambda pid: reads.append(pid) or 0)
+    checking_scan = AsynchronousScan(scanners=[file_size], processes=2, batch_files=1, recycle_uss=1,
+                                     memory_check_interval=60)
+
+    await checking_scan.scan_files(Scan(base, "/dev/null"), resource.create_codebase(base))
+    await checking_scan.refresh_worker_memory()
+    checking_scan.shutdown()
+
+    assert 0 < len(reads) <= 2
+
+
+@pytest.mark.asyncio
+async def test_post_processing_neither_waits_for_nor_blocks_shared_threads(tmp_path, monkeypatch):
+    monkeypatch.setattr(service.postprocessing, "add_license_detections",
+                        lambda codebase, executor, **kwargs: list(executor.map(abs, [-1, -2])))
+    pool_scan = AsynchronousScan(scanners=[file_size], processes=2)
+    pool_scan.executor.shutdown()
+    busy = threading.Event()
+    for _ in range(2):
+        pool_scan.thread_executor.submit(busy.wait)
+
+    try:
+        await asyncio.wait_for(asyncio.gather(
+            *[pool_scan.add_license_detections(resource.create_codebase(tmp_path)) for _ in range(2)]), 5)
+    finally:
+        busy.set()
+        pool_scan.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_small_files_are_scanned_in_batches(fifty_folders_each_contains_single_file, job_counting_scan):
+    base = fifty_folders_each_contains_single_file
+    large_file = next(f for f in base.rglob("*") if f.is_file())
+    large_file.write_bytes(b"x" * 20000)
+    codebase = resource.create_codebase(base, with_sizes=True)
+    batching_scan = job_counting_scan(scanners=[file_size], processes=1, small_file_size=16384, batch_files=10)
+
+    await batching_scan.scan_files(Scan(base, "/dev/null"), codebase)
+    batching_scan.shutdown()
+
+    assert sorted(len(job) for job in batching_scan.submitted) == [1, 9, 10, 10, 10, 10]
+    assert codebase.get_resource(str(large_file.relative_to(base.parent))).size == 20000
+
+
+def initialized(scanners):
+    assert scanners == [file_size]
+
+
+@pytest.mark.asyncio
+async def test_warm_up_starts_all_workers():
+    warm_scan = AsynchronousScan(scanners=[file_size], processes=2, initializer=initialized)
+
+    await warm_scan.warm_up()
+
+    assert len(warm_scan.executor._processes) == 2
+    warm_scan.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_scan_archive_without_extracting_it(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "MEMORY_DIRECTORY", str(tmp_path))
+    monkeypatch.setenv("SCANCODE_TEMP", str(tmp_path))
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.c").write_text("int main() {}")
+    (tmp_path / "README").write_text("readme")
+    with tarfile.open(tmp_path / "release.tar.gz", "w:gz") as f:
+        f.add(tmp_path / "src", arcname="src")
+        f.add(tmp_path / "README", arcname="README")
+    archive_scan = AsynchronousScan(scanners=[file_size], processes=1)
+
+    await archive_scan(Scan(tmp_path / "release.tar.gz", tmp_path / "result.json", archive=True))
+    archive_scan.shutdown()
+
+    with open(tmp_path / "result.json") as f:
+        files = {entry["path"]: entry for entry in json.load(f)["files"]}
+    assert files["release.tar.gz/src/a.c"]["size"] == 13
+    assert files["release.tar.gz/README"]["size"] == 6
+    assert files["release.tar.gz/src"]["type"] == "directory"
+    assert not [name for name in os.listdir(tmp_path) if name.startswith("scancode-archive-")]
+
+
+class SlowMembers:
+    """Archive members which take until `done` is set to read."""
+
+    def __init__(self):
+        self.reading = threading.Event()
+        self.done = threading.Event()
+
+    def __iter__(self):
+        self.reading.set()
+        self.done.wait()
+        yield from ()
+
+
+@pytest.mark.asyncio
+async def test_archive_scan_cancelled_while_reading_stays_cancelled(tmp_path):
+    codebase = resource.create_archive_codebase("release.tar", [])
+    members = SlowMembers()
+    events = Scan(tmp_path / "release.tar", "/dev/null", archive=True).create_events(codebase, members)
+    reading = asyncio.create_task(anext(events, None))
+    while not members.reading.is_set():
+        await asyncio.sleep(0.01)
+
+    asyncio.get_running_loop().call_later(0.1, members.done.set)
+    reading.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await reading
+
+
+@pytest.mark.parametrize("path, patterns, expected", [
+    ("src/main.js", ["*.js"], True),
+    ("src/main.js", ["src"], True),
+    ("lib/node_modules/x/index.js", ["node_modules"], True),
+    ("src/lib/a.c", ["src/*"], True),
+    ("src/main.c", ["*.js", "test*"], False),
+    ("src/main.c", [], False),
+])
+def test_matches_path_parents_and_segments(path, patterns, expected):
+    assert matches(path, patterns) == expected
+
+
+@pytest.mark.asyncio
+async def test_filtered_files_are_not_scanned(tmp_path):
+    base = tmp_path / "project"
+    (base / "src").mkdir(parents=True)
+    (base / "src" / "main.c").write_text("int main() {}")
+    (base / "src" / "main.js").write_text("main()")
+    (base / "src" / "large.c").write_bytes(b"x" * 2048)
+    (base / "tests" / "unit").mkdir(parents=True)
+    (base / "tests" / "unit" / "test.c").write_text("test")
+    (base / "js").mkdir()
+    (base / "js" / "index.js").write_text("index()")
+    filtering_scan = AsynchronousScan(scanners=[file_size], processes=1)
+    single_scan = Scan(base, tmp_path / "result.json", include=("*.c",), exclude=("tests",), max_file_size=1024)
+
+    await filtering_scan(single_scan)
+    filtering_scan.shutdown()
+
+    with open(tmp_path / "result.json") as f:
+        report = json.load(f)
+    assert [entry["path"] for entry in report["files"] if entry["type"] == "file"] == ["project/src/main.c"]
+    assert [entry["path"] for entry in report["files"] if entry["type"] == "directory"] == ["project", "project/src"]
+    assert report["headers"][0]["options"]["include"] == ["*.c"]
+    assert report["headers"][0]["options"]["max_file_size"] == 1024
+
+
+@pytest.mark.asyncio
+async def test_max_file_size_zero_filters_all_but_empty_files(tmp_path):
+    base = tmp_path / "project"
+    base.mkdir()
+    (base / "a.txt").write_text("a")
+    (base / "empty").touch()
+    single_scan = Scan(base, "/dev/null", max_file_size=0)
+    codebase = resource.create_codebase(base, with_sizes=True)
+
+    events = [event.relative_path async for event in single_scan.create_events(codebase)]
+
+    assert events == ["project/empty"]
+
+
+def test_scanners_are_selected_per_scan():
+    selecting_scan = AsynchronousScan(scanners=[file_size], processes=1)
+
+    assert selecting_scan.scanners_for(Scan("base", "out")) == [file_size]
+    selected = selecting_scan.scanners_for(Scan("base", "out", scanners=(Scanner.copyrights, Scanner.info)))
+    selecting_scan.shutdown()
+
+    assert [scanner.__name__ for scanner in selected] == ["get_file_info", "allrights_scanner"]
+
+
+def slow(location, deadline):
+    time.sleep(0.2)
+    return {"size": os.path.getsize(location)}
+
+
+@pytest.mark.parametrize("partial", [True, False])
+@pytest.mark.asyncio
+async def test_cancelled_scan_frees_workers(populated_cache, fifty_folders_each_contains_single_file, tmp_path, partial):
+    jobs = JobRegistry()
+    slow_scan = AsynchronousScan(scanners=[slow], processes=2, batch_files=1, jobs=jobs)
+    single_scan = Scan(fifty_folders_each_contains_single_file, tmp_path / "result.json")
+    jobs.create(single_scan.uuid, single_scan.base, single_scan.output_file)
+    task = asyncio.create_task(slow_scan(single_scan))
+    await asyncio.sleep(1)
+
+    if partial:
+        slow_scan.partial_results.add(str(single_scan.uuid))
+    start = time.perf_counter()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+    slow_scan.shutdown()
+
+    assert time.perf_counter() - start < 1
+    assert slow_scan.scheduler.running == 0 and slow_scan.scheduler.waiting == 0
+    assert jobs.get(single_scan.uuid)["status"] == "cancelled"
+    assert os.path.exists(tmp_path / "result.json") == partial
+    if partial:
+        with open(tmp_path / "result.json") as f:
+            report = json.load(f)
+        assert report["headers"][0]["extra_data"]["cancelled"]
+        assert 0 < len([entry for entry in report["files"] if entry["type"] == "file"]) < 50
@@ -0,0 +1,107 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import asyncio
+import json
+import os
+
+import pytest
+
+from scancode_extensions import resource
+from scancode_extensions import service
+from scancode_extensions.service import AsynchronousScan, Scan
+from scancode_extensions.stream import ResultLog, StreamFormat, render
+
+
+def file_size(location, deadline):
+    return {"size": os.path.getsize(location)}
+
+
+@pytest.fixture
+def codebase(tmp_path):
+    for name in ["a.txt", "b.txt", "c.txt"]:
+        (tmp_path / name).write_text(name)
+    return resource.create_codebase(tmp_path)
+
+
+async def collect(results, offset=0):
+    return [entry async for entry in results.follow(offset)]
+
+
+@pytest.mark.asyncio
+async def test_follow_waits_for_merged_results_until_finished(codebase, tmp_path):
+    results = ResultLog()
+    paths = [f"{tmp_path.name}/{name}" for name in ["a.txt", "b.txt", "c.txt"]]
+    follower = asyncio.create_task(collect(results))
+    await asyncio.sleep(0)
+
+    results.add(codebase, paths[:2])
+    await asyncio.sleep(0.01)
+    assert not follower.done()
+    await asyncio.get_running_loop().run_in_executor(None, results.add, codebase, paths[2:])
+    results.finish()
+
+    entries = await follower
+    assert [offset for offset, _ in entries] == [0, 1, 2]
+    assert [entry["path"] for _, entry in entries] == paths
+    assert [entry["path"] for _, entry in await collect(results, offset=2)] == paths[2:]
+
+
+@pytest.mark.asyncio
+async def test_server_sent_events_carry_offset_as_id(codebase, tmp_path):
+    results = ResultLog()
+    results.add(codebase, [f"{tmp_path.name}/a.txt"])
+    results.finish()
+
+    events = [event async for event in render(results, 0, StreamFormat.sse)]
+
+    assert events[0].startswith("id: 0\nevent: resource\ndata: {")
+    assert events[-1] == "event: end\ndata: {}\n\n"
+
+
+@pytest.mark.asyncio
+async def test_results_are_streamed_while_scanning(tmp_path):
+    (tmp_path / "project").mkdir()
+    for index in range(10):
+        (tmp_path / "project" / f"{index}.txt").write_text("x" * index)
+    streaming_scan = AsynchronousScan(scanners=[file_size], processes=1, deduplicate=False)
+    single_scan = Scan(tmp_path / "project", tmp_path / "result.json")
+
+    lines = asyncio.create_task(collect_lines(render(streaming_scan.results_for(single_scan.uuid), 0,
+                                                     StreamFormat.ndjson)))
+    await streaming_scan(single_scan)
+    streaming_scan.shutdown()
+
+    entries = [json.loads(line) for line in await lines]
+    assert sorted(entry["path"] for entry in entries) == [f"project/{index}.txt" for index in range(10)]
+    assert all(entry["size"] == int(entry["name"][0]) for entry in entries)
+    assert str(single_scan.uuid) not in streaming_scan.results
+
+
+async def collect_lines(lines):
+    return [line async for line in lines]
+
+
+@pytest.mark.asyncio
+async def test_stream_of_scan_cancelled_before_start_ends():
+    results = service.scan.results_for("QUEUED_SCAN")
+    await service.schedule_task(asyncio.sleep(10), "QUEUED_SCAN")
+    task = next(task for task in service.tasks if task.get_name() == "QUEUED_SCAN")
+
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    await asyncio.sleep(0)
+
+    assert await asyncio.wait_for(collect(results), 1) == []
+    assert "QUEUED_SCAN" not in service.scan.results
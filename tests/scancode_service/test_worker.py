@@ -0,0 +1,123 @@
+#  Copyright 2021-2025 the original author or authors.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+
+import gzip
+import os
+import time
+
+from scancode_extensions.worker import classify, initialize_worker, scan_resource, time_budget, timed_scan_resource
+
+
+def copyrights(location, deadline):
+    return {"copyrights": [location]}
+
+
+def licenses(location, deadline):
+    return {"license_detections": [deadline]}
+
+
+def failing(location, deadline):
+    raise RuntimeError("Scanner failed.")
+
+
+def test_results_of_all_scanners_are_merged():
+    result = scan_resource("any/file", [copyrights, licenses], delta_t=10)
+
+    assert result["copyrights"] == ["any/file"]
+    assert "license_detections" in result
+    assert "scan_errors" not in result
+
+
+def test_failing_scanner_does_not_affect_others():
+    result = scan_resource("any/file", [failing, copyrights], delta_t=10)
+
+    assert result["copyrights"] == ["any/file"]
+    assert len(result["scan_errors"]) == 1
+    assert "failing" in result["scan_errors"][0]
+    assert "RuntimeError" in result["scan_errors"][0]
+
+
+def test_deadline_starts_with_scanner():
+    def slow(location, deadline):
+        time.sleep(0.2)
+        return {}
+
+    before = time.time()
+    result = scan_resource("any/file", [slow, licenses], delta_t=10)
+
+    assert result["license_detections"][0] >= before + 10.2
+
+
+def test_execution_time_and_deadline_of_each_scanner_are_measured():
+    def slow(location, deadline):
+        time.sleep(0.2)
+        return {}
+
+    _, measurements = timed_scan_resource("any/file", [slow, copyrights], delta_t=0)
+
+    assert [name for name, _, _ in measurements] == ["slow", "copyrights"]
+    assert measurements[0][1] >= 0.2
+    assert measurements[0][2] is True
+
+
+def test_time_budget_scales_with_file_size(tmp_path):
+    large_file = tmp_path / "large.bin"
+    large_file.write_bytes(b"\0" * 2 * 1024 * 1024)
+
+    assert time_budget(str(large_file), delta_t=10) == 10
+    assert time_budget(str(large_file), delta_t=10, delta_t_per_mib=2.5) == 15
+
+
+def test_initializer_runs_scanners_on_sample(monkeypatch):
+    monkeypatch.setattr("licensedcode.cache.get_index", lambda: None)
+    samples = []
+
+    def recording(location, deadline):
+        with open(location) as f:
+            samples.append(f.read())
+        return {}
+
+    initialize_worker([recording])
+
+    assert "Copyright" in samples[0]
+
+
+def test_classify_files(tmp_path):
+    (tmp_path / "empty").write_bytes(b"")
+    (tmp_path / "main.c").write_text("int main() { return 0; }\n")
+    (tmp_path / "data.gz").write_bytes(gzip.compress(b"x" * 1000))
+    (tmp_path / "program").write_bytes(b"\x7fELF\x02\x01\x01" + bytes(200))
+
+    assert classify(str(tmp_path / "empty")) == "empty"
+    assert classify(str(tmp_path / "main.c")) is None
+    assert classify(str(tmp_path / "data.gz")) == "archive"
+    assert classify(str(tmp_path / "program")) == "binary"
+
+
+def get_file_info(location, deadline):
+    return {"size": os.path.getsize(location)}
+
+
+def test_lightweight_files_are_scanned_by_lightweight_scanners_only(tmp_path):
+    (tmp_path / "data.gz").write_bytes(gzip.compress(b"x" * 1000))
+    (tmp_path / "main.c").write_text("int main() { return 0; }\n")
+
+    result, measurements = timed_scan_resource(str(tmp_path / "data.gz"), [get_file_info, copyrights], delta_t=10,
+                                               lightweight=("archive",))
+    assert [name for name, _, _ in measurements] == ["get_file_info"]
+    assert "copyrights" not in result
+
+    result, measurements = timed_scan_resource(str(tmp_path / "main.c"), [get_file_info, copyrights], delta_t=10,
+                                               lightweight=("archive",))
+    assert [name for name, _, _ in measurements] == ["get_file_info", "copyrights"]